@@ -4,34 +4,37 @@
 # François Pinard <pinard@iro.umontreal.ca>.
 
 import midi
+from voices import Voices
 
 class AlsaPort(midi.Player):
-    def __init__(self, device=128):
-        midi.Player.__init__(self)
+    def __init__(self, device=128, clock=None):
+        midi.Player.__init__(self, clock)
         import alsa
         self.alsa = alsa
         alsa.open(device)
-        # Notes being sound, so we can silence them at close time.
-        self.notes = {}
+        # Notes being sound, so we can silence them at once.  The interface
+        # has no controllers, so this goes by one note off per note.
+        self.voices = Voices()
 
     def close(self):
         if self.opened:
-            for channel, pitch in self.notes.keys():
-                self.note_off(None, channel, pitch, 127)
+            self.silence()
             self.alsa.close()
             self.opened = False
 
+    def silence(self):
+        self.voices.release(self.release_note)
+
+    def release_note(self, channel, pitch):
+        self.alsa.note(False, pitch, 0)
+
     def note_off(self, track, channel, pitch, velocity):
         self.alsa.note(False, pitch, velocity)
-        key = channel, pitch
-        if key in self.notes:
-            del self.notes[key]
+        self.voices.note_off(channel, pitch)
 
     def note_on(self, track, channel, pitch, velocity):
         self.alsa.note(True, pitch, velocity)
-        key = channel, pitch
         if velocity == 0:
-            if key in self.notes:
-                del self.notes[key]
+            self.voices.note_off(channel, pitch)
         else:
-            self.notes[key] = None
+            self.voices.note_on(channel, pitch)
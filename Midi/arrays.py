@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - NumPy tables of events and notes.
+
+These are meant for bulk analysis over many files.  Events and notes are
+returned as NumPy structured arrays, sorted by tick then by track.  The
+event TYPE is the status nibble: 0x80 note off, 0x90 note on, 0xa0 key
+pressure, 0xb0 parameter, 0xc0 program, 0xd0 channel pressure and 0xe0
+pitch wheel.  DATA1 and DATA2 are the event data bytes, except for the
+pitch wheel which has its signed value in DATA1.  Times in seconds follow
+tempo changes, at the nominal speed.
+"""
+
+import midi
+
+event_dtype = [('tick', '<i8'), ('seconds', '<f8'), ('track', '<i2'),
+               ('channel', '<i1'), ('type', '<u1'),
+               ('data1', '<i2'), ('data2', '<i2')]
+
+note_dtype = [('tick', '<i8'), ('seconds', '<f8'),
+              ('end_tick', '<i8'), ('end_seconds', '<f8'),
+              ('duration', '<f8'), ('track', '<i2'), ('channel', '<i1'),
+              ('pitch', '<i1'), ('velocity', '<i1')]
+
+# Bytes per event record.
+RECORD_SIZE = 24
+
+# Default tempo, in micro-seconds per quarter note.
+DEFAULT_TEMPO = 500000
+
+class Tabulator(midi.Processor):
+    # Accumulate channel events into compact columns, and tempo changes
+    # apart.  TICK should be set by the caller before each event.
+
+    def __init__(self):
+        from array import array
+        self.tick = 0
+        self.ticks = array('l')
+        self.tracks = array('h')
+        self.channels = array('b')
+        self.types = array('B')
+        self.data1 = array('h')
+        self.data2 = array('h')
+        self.tempo_ticks = array('l')
+        self.tempos = array('l')
+
+    def add(self, track, channel, type, data1, data2):
+        self.ticks.append(self.tick)
+        self.tracks.append(track.number)
+        self.channels.append(channel)
+        self.types.append(type)
+        self.data1.append(data1)
+        self.data2.append(data2)
+
+    def note_off(self, track, channel, pitch, velocity):
+        self.add(track, channel, 0x80, pitch, velocity)
+
+    def note_on(self, track, channel, pitch, velocity):
+        self.add(track, channel, 0x90, pitch, velocity)
+
+    def key_pressure(self, track, channel, pitch, pressure):
+        self.add(track, channel, 0xa0, pitch, pressure)
+
+    def parameter(self, track, channel, parameter, setting):
+        self.add(track, channel, 0xb0, parameter, setting)
+
+    def program(self, track, channel, program):
+        self.add(track, channel, 0xc0, program, 0)
+
+    def channel_pressure(self, track, channel, pressure):
+        self.add(track, channel, 0xd0, pressure, 0)
+
+    def pitch_wheel(self, track, channel, wheel):
+        self.add(track, channel, 0xe0, wheel, 0)
+
+    def set_tempo(self, track, tempo):
+        self.tempo_ticks.append(self.tick)
+        self.tempos.append(tempo)
+
+def tabulate(decoder):
+    # Run all tracks of DECODER through a Tabulator, and return it.
+    return tabulate_tracks(decoder.tracks)
+
+def tabulate_tracks(tracks):
+    tabulator = Tabulator()
+    for track in tracks:
+        track.rewind()
+        tabulator.tick = 0
+        while track.delta is not None:
+            tabulator.tick += track.delta
+            midi.dispatch_event(track, tabulator)
+    return tabulator
+
+def tabulator_array(tabulator):
+    # Return channel events of TABULATOR as an array, seconds left to zero.
+    import numpy
+    events = numpy.zeros(len(tabulator.ticks), event_dtype)
+    events['tick'] = numpy.frombuffer(tabulator.ticks, numpy.dtype('l'))
+    events['track'] = numpy.frombuffer(tabulator.tracks, numpy.int16)
+    events['channel'] = numpy.frombuffer(tabulator.channels, numpy.int8)
+    events['type'] = numpy.frombuffer(tabulator.types, numpy.uint8)
+    events['data1'] = numpy.frombuffer(tabulator.data1, numpy.int16)
+    events['data2'] = numpy.frombuffer(tabulator.data2, numpy.int16)
+    return events
+
+def tabulate_track(track):
+    # Return (RECORDS, TEMPOS) for TRACK, as the accelerator does.
+    if midi.accel is not None:
+        return midi.accel.tabulate_track(track)
+    tabulator = tabulate_tracks([track])
+    return (tabulator_array(tabulator).tostring(),
+            zip(tabulator.tempo_ticks, tabulator.tempos))
+
+# File buffer and shared records for pool workers, which get them by
+# inheritance when forked, instead of through pipes.
+shared = None
+
+def tabulate_shared(arguments):
+    # Tabulate the track starting at START in the shared file buffer, and
+    # copy its records into the shared records at OFFSET, given as (NUMBER,
+    # START, OFFSET).  Return the record count and tempo changes.  This
+    # runs within pool workers.
+    number, start, offset = arguments
+    buffer, records = shared
+    track = midi.Track(buffer, start, number, midi.Run())
+    data, tempos = tabulate_track(track)
+    records[offset:offset+len(data)] = data
+    return len(data) // RECORD_SIZE, tempos
+
+def tabulate_parallel(decoder, jobs=None):
+    # Return (EVENTS, TEMPO_TICKS, TEMPOS) for DECODER, tabulating tracks
+    # in JOBS worker processes.  Records go through shared memory, sized
+    # from a quick skim of each track.
+    import multiprocessing, numpy, skim
+    global shared
+    offsets = []
+    size = 0
+    for track in decoder.tracks:
+        offsets.append(size)
+        size += skim.skim_track(track)[1] * RECORD_SIZE
+    records = multiprocessing.RawArray('c', max(size, 1))
+    shared = decoder.tracks[0].buffer, records
+    try:
+        pool = multiprocessing.Pool(jobs)
+        try:
+            results = pool.map(tabulate_shared,
+                               [(track.number, track.start, offset)
+                                for track, offset in zip(decoder.tracks,
+                                                         offsets)], 1)
+        except:
+            # Leave no worker behind, even when interrupted.
+            pool.terminate()
+            raise
+        else:
+            pool.close()
+        finally:
+            pool.join()
+    finally:
+        shared = None
+    everything = numpy.frombuffer(records, event_dtype,
+                                  size // RECORD_SIZE)
+    fragments = []
+    tempo_ticks = []
+    tempos = []
+    for offset, (count, pairs) in zip(offsets, results):
+        start = offset // RECORD_SIZE
+        fragments.append(everything[start:start+count])
+        for tick, tempo in pairs:
+            tempo_ticks.append(tick)
+            tempos.append(tempo)
+    return numpy.concatenate(fragments), tempo_ticks, tempos
+
+def seconds_function(division, tempo_ticks, tempos):
+    # Return a function mapping an array of ticks into seconds, given the
+    # ticks per quarter note, and tempo changes from all tracks.
+    import numpy
+    tempo_ticks = numpy.array(tempo_ticks, numpy.int64)
+    tempos = numpy.array(tempos, numpy.int64)
+    order = numpy.argsort(tempo_ticks, kind='mergesort')
+    starts = numpy.concatenate(([0], tempo_ticks[order]))
+    rates = numpy.concatenate(([DEFAULT_TEMPO], tempos[order])) * 1e-6
+    rates /= division
+    # Seconds elapsed at each tempo change.
+    bases = numpy.concatenate(
+        ([0.], numpy.cumsum(numpy.diff(starts) * rates[:-1])))
+    def seconds(ticks):
+        index = numpy.searchsorted(starts, ticks, side='right') - 1
+        return bases[index] + (ticks - starts[index]) * rates[index]
+    return seconds
+
+def event_array(decoder, jobs=None):
+    # When JOBS is not None, tracks are tabulated in that many worker
+    # processes, or as many as processors if JOBS is 0.
+    import numpy
+    if jobs is not None and len(decoder.tracks) > 1:
+        events, tempo_ticks, tempos = tabulate_parallel(decoder, jobs or None)
+    elif midi.accel is None:
+        tabulator = tabulate(decoder)
+        events = tabulator_array(tabulator)
+        tempo_ticks = tabulator.tempo_ticks
+        tempos = tabulator.tempos
+    else:
+        # The accelerator lays out records directly.
+        fragments = []
+        tempo_ticks = []
+        tempos = []
+        for track in decoder.tracks:
+            records, pairs = midi.accel.tabulate_track(track)
+            fragments.append(records)
+            for tick, tempo in pairs:
+                tempo_ticks.append(tick)
+                tempos.append(tempo)
+        events = numpy.frombuffer(''.join(fragments), event_dtype).copy()
+    # Tracks were appended one after another, a stable sort by tick yields
+    # the merged order.
+    events = events[numpy.argsort(events['tick'], kind='mergesort')]
+    seconds = seconds_function(decoder.header.division, tempo_ticks, tempos)
+    events['seconds'] = seconds(events['tick'])
+    return events
+
+def note_array(events):
+    # Pair note on and note off EVENTS into note intervals.  Within each
+    # channel and pitch, the Nth note off closes the Nth note on, and note
+    # offs having no pending note on are ignored.  Notes still held at
+    # the end are closed by the last event.
+    import numpy
+    types = events['type']
+    selected = ((types == 0x80) | (types == 0x90))
+    notes = events[selected]
+    is_on = (notes['type'] == 0x90) & (notes['data2'] > 0)
+    keys = notes['channel'].astype(int) * 128 + notes['data1']
+    # Group by key, keeping time order within each group.
+    order = numpy.argsort(keys, kind='mergesort')
+    keys = keys[order]
+    is_on = is_on[order]
+    notes = notes[order]
+    count = len(keys)
+    starts = numpy.ones(count, bool)
+    starts[1:] = keys[1:] != keys[:-1]
+    groups = numpy.cumsum(starts) - 1
+    group_starts = numpy.flatnonzero(starts)
+    # Running balance of pending note ons within each group, before
+    # clamping at zero.
+    steps = numpy.where(is_on, 1, -1)
+    totals = numpy.cumsum(steps)
+    balances = totals - (totals - steps)[group_starts][groups]
+    # Offsetting each group far below the previous ones confines the
+    # running minimum within groups.  An ineffective note off is one
+    # which lowers the running minimum under zero.
+    big = 2 * count + 2
+    minima = numpy.minimum.accumulate(balances - groups * big)
+    minima = numpy.minimum(minima + groups * big, 0)
+    previous = numpy.zeros(count, int)
+    previous[1:] = minima[:-1]
+    previous[starts] = 0
+    effective = ~is_on & (minima == previous)
+    # Rank note ons and effective note offs within their group, then match
+    # them by (group, rank).
+    def ranks(mask):
+        totals = numpy.cumsum(mask)
+        return totals - 1 - (totals - mask)[group_starts][groups]
+    on_index = numpy.flatnonzero(is_on)
+    off_index = numpy.flatnonzero(effective)
+    on_keys = groups[on_index] * big + ranks(is_on)[on_index]
+    off_keys = groups[off_index] * big + ranks(effective)[off_index]
+    found = numpy.searchsorted(off_keys, on_keys)
+    found = numpy.minimum(found, max(len(off_keys) - 1, 0))
+    closed = numpy.zeros(len(on_index), bool)
+    if len(off_keys):
+        closed = off_keys[found] == on_keys
+    ons = notes[on_index]
+    result = numpy.empty(len(ons), note_dtype)
+    result['tick'] = ons['tick']
+    result['seconds'] = ons['seconds']
+    result['track'] = ons['track']
+    result['channel'] = ons['channel']
+    result['pitch'] = ons['data1']
+    result['velocity'] = ons['data2']
+    if len(events):
+        result['end_tick'] = events['tick'][-1]
+        result['end_seconds'] = events['seconds'][-1]
+    offs = notes[off_index[found[closed]]]
+    result['end_tick'][closed] = offs['tick']
+    result['end_seconds'][closed] = offs['seconds']
+    result['duration'] = result['end_seconds'] - result['seconds']
+    return result[numpy.argsort(result['tick'], kind='mergesort')]
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Library index in SQLite.
+
+A Catalog keeps, in a SQLite database, what is worth searching in a MIDI
+library: durations, tempos, track names, instruments, programs, lyrics and
+other texts.  Files are described in parallel worker processes.  When the
+catalog gets updated, only files whose size or modification time changed
+are described again, and files which disappeared are forgotten.
+"""
+
+import midi
+
+schema = '''\
+create table if not exists files (
+    id integer primary key,
+    name text unique,
+    mtime real,
+    size integer,
+    error text,
+    format integer,
+    division integer,
+    tracks integer,
+    ticks integer,
+    seconds real,
+    bars integer,
+    events integer,
+    tempo real,                 -- starting quarter notes per minute
+    slowest real,
+    fastest real);
+create table if not exists tracks (
+    file integer,
+    number integer,
+    name text,
+    instrument text,
+    ticks integer,
+    seconds real,
+    events integer);
+create table if not exists programs (
+    file integer,
+    track integer,
+    channel integer,
+    program integer);
+create table if not exists texts (
+    file integer,
+    track integer,
+    tick integer,
+    kind text,
+    text text);
+create index if not exists tracks_file on tracks (file);
+create index if not exists programs_file on programs (file);
+create index if not exists programs_program on programs (program);
+create index if not exists texts_file on texts (file);
+'''
+
+# Default tempo, in micro-seconds per quarter note.
+DEFAULT_TEMPO = 500000
+
+class Cataloger(midi.Processor):
+    # Gather texts, programs and tempos, as given by serial_process.
+
+    def __init__(self):
+        self.tick = 0
+        self.names = {}                 # track number -> name
+        self.instruments = {}           # track number -> instrument
+        self.programs = {}              # (track, channel, program) -> None
+        self.texts = []                 # (track, tick, kind, text)
+        self.tempos = []                # (tick, tempo)
+
+    def delay(self, delta):
+        self.tick += delta
+
+    def end_of_track(self, track):
+        self.tick = 0
+
+    def program(self, track, channel, program):
+        self.programs[track.number, channel, program] = None
+
+    def meta_event_text(self, track, text, message):
+        text = text.tobytes().rstrip('\0').strip()
+        if message == 'Sequence/Track':
+            self.names.setdefault(track.number, text)
+        elif message == 'Instrument':
+            self.instruments.setdefault(track.number, text)
+        if text:
+            self.texts.append((track.number, self.tick, message, text))
+
+    def set_tempo(self, track, tempo):
+        self.tempos.append((self.tick, tempo))
+
+def describe_file(name):
+    # Return (NAME, ERROR, FILE, TRACKS, PROGRAMS, TEXTS) for file NAME,
+    # where FILE and TRACKS hold row values for their tables, without ids.
+    # If NAME cannot be decoded, ERROR tells why.  This runs within pool
+    # workers.
+    from main import decode_file
+    try:
+        decoder = decode_file(name, midi.Run())
+        timing = decoder.timing()
+        cataloger = Cataloger()
+        decoder.serial_process(cataloger)
+    except Exception, exception:
+        # One odd file gets recorded as an error, the index goes on.
+        return (name, str(exception) or exception.__class__.__name__,
+                None, [], [], [])
+    tempos = [tempo for tick, tempo in sorted(cataloger.tempos)]
+    if not cataloger.tempos or min(cataloger.tempos)[0] > 0:
+        tempos.insert(0, DEFAULT_TEMPO)
+    tempos = [6e7 / tempo for tempo in tempos if tempo]
+    if tempos:
+        tempo, slowest, fastest = tempos[0], min(tempos), max(tempos)
+    else:
+        # All tempos are null, none is known.
+        tempo = slowest = fastest = None
+    header = decoder.header
+    values = (header.midi_file_format, header.division, len(timing.tracks),
+              timing.ticks, timing.seconds, timing.bars, timing.events,
+              tempo, slowest, fastest)
+    tracks = []
+    for number, ticks, seconds, events in timing.tracks:
+        tracks.append((number, cataloger.names.get(number),
+                       cataloger.instruments.get(number),
+                       ticks, seconds, events))
+    return (name, None, values, tracks, sorted(cataloger.programs),
+            cataloger.texts)
+
+class Catalog:
+
+    def __init__(self, database):
+        import sqlite3
+        self.connection = sqlite3.connect(database)
+        # File names and MIDI texts have no declared encoding, keep bytes.
+        self.connection.text_factory = str
+        self.connection.executescript(schema)
+
+    def close(self):
+        self.connection.close()
+
+    def update(self, arguments, jobs=None, write=None):
+        # Bring the catalog up to date for files within ARGUMENTS, files
+        # or directories, using JOBS worker processes.  Errors are reported
+        # through WRITE, if given.  Return counts of (UNCHANGED, DESCRIBED,
+        # FORGOTTEN) files.
+        import os
+        cursor = self.connection.cursor()
+        known = {}
+        for id, name, mtime, size in cursor.execute(
+                'select id, name, mtime, size from files'):
+            known[name] = id, mtime, size
+        # Only stat files here, which is all it takes when nothing changed.
+        import playlist
+        changed = []
+        unchanged = 0
+        seen = {}
+        for name in playlist.find_files(arguments):
+            try:
+                status = os.stat(name)
+            except OSError:
+                continue
+            seen[name] = None
+            entry = known.get(name)
+            if (entry is not None and entry[1] == status.st_mtime
+                    and entry[2] == status.st_size):
+                unchanged += 1
+            else:
+                changed.append((name, status.st_mtime, status.st_size))
+        # Forget files gone from within ARGUMENTS.
+        roots = [os.path.join(argument, '') for argument in arguments
+                 if os.path.isdir(argument)]
+        forgotten = 0
+        for name, entry in known.iteritems():
+            if name not in seen and (name in arguments or [
+                    root for root in roots if name.startswith(root)]):
+                self.forget(cursor, entry[0])
+                forgotten += 1
+        if changed:
+            import multiprocessing
+            pool = multiprocessing.Pool(jobs)
+            stats = {}
+            for name, mtime, size in changed:
+                stats[name] = mtime, size
+            for (name, error, values, tracks, programs,
+                 texts) in pool.imap_unordered(
+                    describe_file, [entry[0] for entry in changed], 16):
+                if error is not None and write is not None:
+                    write("%s: %s\n" % (name, error))
+                self.store(cursor, known.get(name), name, stats[name],
+                           error, values, tracks, programs, texts)
+            pool.close()
+            pool.join()
+        self.connection.commit()
+        return unchanged, len(changed), forgotten
+
+    def forget(self, cursor, id):
+        for table in 'tracks', 'programs', 'texts':
+            cursor.execute('delete from %s where file = ?' % table, (id,))
+        cursor.execute('delete from files where id = ?', (id,))
+
+    def store(self, cursor, entry, name, stat, error, values, tracks,
+              programs, texts):
+        if entry is not None:
+            self.forget(cursor, entry[0])
+        if values is None:
+            values = (None,) * 10
+        cursor.execute('insert into files values (null, ?, ?, ?, ?,'
+                       ' ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                       (name,) + stat + (error,) + tuple(values))
+        id = cursor.lastrowid
+        cursor.executemany('insert into tracks values (?, ?, ?, ?, ?, ?, ?)',
+                           [(id,) + row for row in tracks])
+        cursor.executemany('insert into programs values (?, ?, ?, ?)',
+                           [(id,) + row for row in programs])
+        cursor.executemany('insert into texts values (?, ?, ?, ?, ?)',
+                           [(id,) + row for row in texts])
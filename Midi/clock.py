@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Clocks for players.
+
+Players read the time and sleep through a clock.  The WallClock uses real
+time.  A VirtualClock only moves when asked, so whole files play at once,
+while every deadline, sleep and emitted event gets recorded with its exact
+virtual time.  This allows checking schedules without waiting, nor any
+sound hardware.
+"""
+
+import midi
+
+class WallClock:
+
+    def time(self):
+        import time
+        return time.time()
+
+    def sleep(self, seconds):
+        import time
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def wait(self, goal):
+        # Sleep until time GOAL, unless we are late already.
+        now = self.time()
+        if now < goal:
+            self.sleep(goal - now)
+
+wall_clock = WallClock()
+
+class VirtualClock(WallClock):
+    # Time starts at START.  DEADLINES gets (TIME, GOAL) for each wait,
+    # SLEEPS gets (TIME, SECONDS) for each sleep, and EVENTS gets (TIME,
+    # NAME, ARGUMENTS) for each event recorded.  Each recorded event costs
+    # LAG seconds, to simulate a slow output, so players fall behind.
+
+    def __init__(self, start=0., lag=0.):
+        self.now = start
+        self.lag = lag
+        self.deadlines = []
+        self.sleeps = []
+        self.events = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append((self.now, seconds))
+        if seconds > 0:
+            self.now += seconds
+
+    def wait(self, goal):
+        self.deadlines.append((self.now, goal))
+        WallClock.wait(self, goal)
+
+    def burn(self, seconds):
+        # Let SECONDS pass without sleeping, as when computing.
+        self.now += seconds
+
+    def record(self, name, arguments):
+        self.events.append((self.now, name, arguments))
+        self.now += self.lag
+
+class Recorder(midi.Player):
+    # A player recording channel events and sysex into CLOCK, usually a
+    # VirtualClock, instead of sounding them.
+
+    def __init__(self, clock):
+        midi.Player.__init__(self, clock)
+
+    def close(self):
+        self.opened = False
+
+    def note_off(self, track, channel, pitch, velocity):
+        self.clock.record('note_off', (channel, pitch, velocity))
+
+    def note_on(self, track, channel, pitch, velocity):
+        self.clock.record('note_on', (channel, pitch, velocity))
+
+    def key_pressure(self, track, channel, pitch, pressure):
+        self.clock.record('key_pressure', (channel, pitch, pressure))
+
+    def parameter(self, track, channel, parameter, setting):
+        self.clock.record('parameter', (channel, parameter, setting))
+
+    def program(self, track, channel, program):
+        self.clock.record('program', (channel, program))
+
+    def channel_pressure(self, track, channel, pressure):
+        self.clock.record('channel_pressure', (channel, pressure))
+
+    def pitch_wheel(self, track, channel, wheel):
+        self.clock.record('pitch_wheel', (channel, wheel))
+
+    def sysex(self, track, bytes, continuation=False):
+        self.clock.record('sysex', (bytes.tobytes(), continuation))
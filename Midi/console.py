@@ -4,6 +4,43 @@
 # François Pinard <pinard@iro.umontreal.ca>.
 
 import midi
+from voices import Voices
+
+# Start sound generation (0 for off) -- value from <linux/kd.h>.
+KIOCSOUND = 0x4B2F
+
+# Frequencies in Hertz of all 128 MIDI pitches, for an equal temperament,
+# tuned to a 440 diapason on pitch 69.
+frequencies = tuple([440. * 2 ** ((pitch - 69) / 12.) for pitch in range(128)])
+
+class BeeperSink:
+    # Send wave numbers to the console beeper.  The file should be
+    # associated to a virtual terminal.
+
+    def __init__(self, file=None):
+        if file is None:
+            import sys
+            file = sys.stderr
+        import fcntl
+        self.ioctl = fcntl.ioctl
+        self.file = file
+
+    def sound(self, wave_number):
+        self.ioctl(self.file, KIOCSOUND, wave_number)
+
+class DryRunSink:
+    # Record the beep timeline instead of sounding it.  TIMELINE receives
+    # (TIME, WAVE_NUMBER) pairs, a zero WAVE_NUMBER meaning silence.  TIME
+    # is read from CLOCK, which should be the player's.
+
+    def __init__(self, clock=None):
+        if clock is None:
+            from clock import wall_clock as clock
+        self.clock = clock
+        self.timeline = []
+
+    def sound(self, wave_number):
+        self.timeline.append((self.clock.time(), wave_number))
 
 class Console(midi.Player):
     # Standard Input must be associated to a virtual terminal.
@@ -14,8 +51,6 @@ class Console(midi.Player):
     # is the idea behind this console beep player, admittedly a toy! :-) It
     # nevertheless could be used to debug MIDI scores without a sound card.
 
-    # Start sound generation (0 for off) -- value from <linux/kd.h>.
-    KIOCSOUND = 0x4B2F
     # Pseudo-sampling rate of the beeper console, first found
     # experimentally, then corrected (-100) by peeking into kernel sources.
     sampling_rate = 1193180
@@ -27,128 +62,147 @@ class Console(midi.Player):
     # If True, hash even a single voice.  There is a problem when False,
     # which I do not understand: maybe `time.sleep()' then gets interrupted?
     hash_single_voice = True
-    # Number of supported octaves.
-    number_of_octaves = 13
-    # Zero based ordinal of the middle octave.
-    middle_octave = 5
-    # Frequencies in Hertz of the chromatic scale, from C3 to B4, for an equal
-    # temperament, tuned to a 440 diapason.
-    chromatic_scale = (
-        523.25, 554.37, 587.33, 622.25, 659.26, 698.46, 739.99, 783.99,
-        830.61, 880.00, 932.33, 987.77)
-
-    def __init__(self):
-        midi.Player.__init__(self)
-        # Wave numbers are proportional to wave lengths.
-        self.wave_number = [None] * (Console.number_of_octaves * 12)
-        # Initialize the main scale.
-        for base in range(12):
-            pitch = Console.middle_octave * 12 + base
-            self.wave_number[pitch] = int(
-                Console.sampling_rate / Console.chromatic_scale[base])
-        # Initialize octaves and suboctaves.
-        for pitch in range(Console.middle_octave * 12 - 1, -1, -1):
-            self.wave_number[pitch] = self.wave_number[pitch + 12] * 2
-        for pitch in range((Console.middle_octave + 1) * 12,
-                           Console.number_of_octaves * 12):
-            self.wave_number[pitch] = self.wave_number[pitch - 12] // 2
-        # All sound pitches never heard at least once.
-        self.urgent = []
-        # All sound pitches currently played, including URGENT.
-        self.pitches = []
-        # ROVER gives the current PITCHES index, it is global for all sounds.
-        # This increases the probability that all sounds are equally heard.
+    # Wave numbers are proportional to wave lengths, indexed by pitch.  The
+    # beeper sounds better one octave higher than written.
+    wave_number = tuple([int(sampling_rate / (2 * frequency))
+                         for frequency in frequencies])
+
+    def __init__(self, sink=None, clock=None):
+        midi.Player.__init__(self, clock)
+        if sink is None:
+            sink = BeeperSink()
+        self.sink = sink
+        # Wave number currently sent to the sink, to avoid redundant calls.
+        self.sounding = 0
+        self.forget()
+
+    def forget(self):
+        # KEYS counts note ons by channel and pitch, a pitch stays sounding
+        # while any channel holds it.
+        self.keys = Voices()
+        # All sound pitches currently played form a ring, linked through
+        # NEXT and PREVIOUS, both indexed by pitch.  ROVER is the current
+        # pitch within the ring, it is global for all sounds.  This
+        # increases the probability that all sounds are equally heard.
+        self.next = [None] * 128
+        self.previous = [None] * 128
         self.rover = None
+        self.voices = 0
+        # All sound pitches never heard at least once, in arrival order, and
+        # a flag per pitch telling if that pitch is still urgent.
+        self.urgent = []
+        self.is_urgent = [False] * 128
 
     def close(self):
         if self.opened:
-            import fcntl, sys
             # Silence the last sound.
-            fcntl.ioctl(sys.stderr, Console.KIOCSOUND, 0)
+            self.sound(0)
             self.opened = False
 
+    def silence(self):
+        self.forget()
+        self.sound(0)
+
+    def sound(self, wave_number):
+        if wave_number != self.sounding:
+            self.sink.sound(wave_number)
+            self.sounding = wave_number
+
     def delay(self, delta):
-        if midi.run.mute:
+        if self.run.mute:
             return
-        import fcntl, sys, time
         self.goal += delta * self.time_rate
-        if not self.pitches:
+        if not self.voices:
             # Silence the last sound.
-            fcntl.ioctl(sys.stderr, Console.KIOCSOUND, 0)
-            now = time.time()
-            while now < self.goal:
-                time.sleep(self.goal - now)
-                now = time.time()
+            self.sound(0)
+            self.clock.wait(self.goal)
             return
-        # Play all sounds from the PITCHES array, hashing them to achieve
-        # multi-voice effect, but no more than HASHING seconds at a time.
-        # Guarantee that urgent sounds are heard at least once, even if
-        # this makes us a bit late.  Hopefully, we will catch up later.
-        dividend = max(self.goal - time.time(), Console.minimum_hashing)
-        divider = len(self.pitches)
-        if len(self.pitches) > 1 or Console.hash_single_voice:
+        # Play all sounds from the ring, hashing them to achieve multi-voice
+        # effect, but no more than HASHING seconds at a time.  Guarantee
+        # that urgent sounds are heard at least once, even if this makes us
+        # a bit late.  Hopefully, we will catch up later.
+        wave_number = Console.wave_number
+        clock = self.clock
+        link = self.next
+        is_urgent = self.is_urgent
+        hashing = dividend = max(self.goal - clock.time(),
+                                 Console.minimum_hashing)
+        divider = self.voices
+        if divider > 1 or Console.hash_single_voice:
             hashing = dividend / divider
             while hashing > Console.maximum_hashing:
                 hashing *= .5
             while hashing < Console.minimum_hashing and divider > 1:
                 divider -= 1
                 hashing = dividend / divider
-            #if divider == len(self.pitches):
-            #    self.rover = 0
-        if self.urgent:
-            self.urgent.sort()
-            for pitch in self.urgent:
+        urgent = sorted(set([pitch for pitch in self.urgent
+                             if is_urgent[pitch]]))
+        if urgent:
+            for pitch in urgent:
                 # Start sound.
-                fcntl.ioctl(sys.stderr, Console.KIOCSOUND,
-                            self.wave_number[pitch])
-                time.sleep(hashing)
-        now = time.time()
+                self.sound(wave_number[pitch])
+                clock.sleep(hashing)
+        now = clock.time()
+        pitch = self.rover
         while now < self.goal:
-            pitch = self.pitches[self.rover]
-            if pitch in self.urgent:
-                self.urgent.remove(pitch)
+            if is_urgent[pitch]:
+                is_urgent[pitch] = False
             else:
                 # Start sound.
-                fcntl.ioctl(sys.stderr, Console.KIOCSOUND,
-                            self.wave_number[pitch])
-                time.sleep(hashing)
-                now = time.time()
-            self.rover += 1
-            if self.rover == len(self.pitches):
-                self.rover = 0
+                self.sound(wave_number[pitch])
+                clock.sleep(hashing)
+                now = clock.time()
+            pitch = link[pitch]
+        self.rover = pitch
+        for pitch in urgent:
+            is_urgent[pitch] = False
         self.urgent = []
 
     def note_off(self, track, channel, pitch, velocity):
-        if channel == midi.run.drum_channel or pitch not in self.pitches:
+        if channel == self.run.drum_channel:
+            return
+        self.keys.note_off(channel, pitch)
+        if self.keys.pitches[pitch] or self.next[pitch] is None:
             return
-        index = self.pitches.index(pitch)
-        del self.pitches[index]
-        if self.rover > index:
-            self.rover -= 1
-        elif self.rover == index == len(self.pitches):
-            if self.pitches:
-                self.rover = 0
+        # Unlink PITCH from the ring.
+        following = self.next[pitch]
+        preceding = self.previous[pitch]
+        self.next[preceding] = following
+        self.previous[following] = preceding
+        self.next[pitch] = self.previous[pitch] = None
+        self.voices -= 1
+        if self.rover == pitch:
+            if self.voices:
+                self.rover = following
             else:
                 self.rover = None
+        # Stale URGENT entries are filtered out by the next delay.
+        self.is_urgent[pitch] = False
 
     def note_on(self, track, channel, pitch, velocity):
         if velocity == 0:
             self.note_off(track, channel, pitch, 0)
             return
-        if midi.run.mute:
+        if self.run.mute:
             return
-        if channel == midi.run.drum_channel:
+        if channel == self.run.drum_channel:
             return
-        if pitch in self.pitches:
+        if not 0 < pitch < 128:
             return
-        if 0 < pitch < Console.number_of_octaves * 12:
-            self.urgent.append(pitch)
-            if self.pitches:
-                from bisect import bisect
-                index = bisect(self.pitches, pitch)
-                self.pitches.insert(index, pitch)
-                if self.rover >= index:
-                    self.rover += 1
-            else:
-                self.pitches.append(pitch)
-                self.rover = 0
+        self.keys.note_on(channel, pitch)
+        if self.next[pitch] is not None:
+            return
+        self.urgent.append(pitch)
+        self.is_urgent[pitch] = True
+        # Link PITCH in the ring, just before the rover.
+        if self.voices:
+            following = self.rover
+            preceding = self.previous[following]
+            self.next[preceding] = pitch
+            self.previous[pitch] = preceding
+            self.next[pitch] = following
+            self.previous[following] = pitch
+        else:
+            self.next[pitch] = self.previous[pitch] = pitch
+            self.rover = pitch
+        self.voices += 1
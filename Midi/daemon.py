@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Resident player.
+
+A Daemon keeps its MIDI port open and decoded files warm, and listens on a
+local UNIX socket.  Each connection sends one request line, fields being
+separated by tabs, and gets one reply line starting with `ok' or `error'.
+
+    play NAME...        stop, forget the queue, then play NAMEs
+    queue NAME...       play NAMEs after those already queued
+    skip                go on with the next queued file
+    stop                stop, and forget the queue
+    status              reply with the file playing and the queue
+    quit                stop and exit the daemon
+
+Transport commands, like `p' or `b BAR', apply to the file being played.
+Files get decoded while the request is handled, unless already decoded, so
+playback starts within milliseconds when the reply comes.
+"""
+
+import os, socket, threading
+
+# Number of decoded files kept.
+CACHE_SIZE = 32
+
+class Daemon:
+    # Serve requests on socket PATH, playing decoded files through
+    # PROCESSOR, which sends to PLAYERS, midi.Player instances having
+    # TRANSPORT as their clock, the first one being followed for time.
+    # Files are decoded by DECODE(NAME, RUN), each with its own copy of RUN.
+
+    def __init__(self, path, transport, processor, players, decode, run):
+        self.path = path
+        self.transport = transport
+        self.processor = processor
+        self.players = players
+        self.decode = decode
+        self.run = run
+        # CACHE maps a name to (MTIME, SIZE, DECODER), RECENT lists names
+        # from the least recently used.  Both are protected by CACHE_LOCK.
+        self.cache = {}
+        self.recent = []
+        self.cache_lock = threading.Lock()
+        # QUEUE lists (NAME, DECODER) to play, CURRENT is the name being
+        # played, or None.  Both are protected by CONDITION.
+        self.condition = threading.Condition()
+        self.queue = []
+        self.current = None
+        self.quitting = False
+        if os.path.exists(path):
+            os.unlink(path)
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.socket.bind(path)
+        self.socket.listen(5)
+
+    def serve(self):
+        # Accept requests in a background thread, and play in this one
+        # until a `quit' request.
+        thread = threading.Thread(target=self.accept)
+        thread.setDaemon(True)
+        thread.start()
+        try:
+            while True:
+                self.condition.acquire()
+                try:
+                    while not self.queue and not self.quitting:
+                        self.condition.wait()
+                    if self.quitting:
+                        break
+                    self.current, decoder = self.queue.pop(0)
+                    # Commands left from the previous file do not apply.
+                    self.transport.clear()
+                finally:
+                    self.condition.release()
+                # Time restarts now, rather than where the previous file
+                # ended, lest players rush to catch up.  Speed changes only
+                # last for one file.
+                for player in self.players:
+                    player.goal = None
+                decoder.run.speed_factor = self.run.speed_factor
+                self.transport.play(decoder, self.processor, self.players)
+                self.current = None
+        finally:
+            self.processor.silence()
+            self.socket.close()
+            os.unlink(self.path)
+
+    def accept(self):
+        while True:
+            connection, address = self.socket.accept()
+            thread = threading.Thread(target=self.handle,
+                                      args=(connection,))
+            thread.setDaemon(True)
+            thread.start()
+
+    def handle(self, connection):
+        try:
+            input = connection.makefile('r')
+            line = input.readline()
+            try:
+                reply = self.request(line.rstrip('\n').split('\t'))
+            except (IOError, OSError, AssertionError, IndexError), exception:
+                reply = 'error\t%s' % (str(exception)
+                                        or exception.__class__.__name__)
+            connection.sendall(reply + '\n')
+        finally:
+            connection.close()
+
+    def request(self, fields):
+        # Obey FIELDS from a request line, and return the reply.
+        command = fields[0]
+        if command in ('play', 'queue'):
+            decoders = [(name, self.decoder(name)) for name in fields[1:]]
+            self.condition.acquire()
+            try:
+                if command == 'play':
+                    self.stop()
+                self.queue += decoders
+                self.condition.notify()
+            finally:
+                self.condition.release()
+            return 'ok'
+        if command in ('skip', 'stop', 'quit'):
+            self.condition.acquire()
+            try:
+                if command == 'skip':
+                    if self.current is not None:
+                        self.transport.stop()
+                else:
+                    self.stop()
+                    if command == 'quit':
+                        self.quitting = True
+                        self.condition.notify()
+            finally:
+                self.condition.release()
+            return 'ok'
+        if command == 'status':
+            self.condition.acquire()
+            try:
+                names = [self.current or ''] + [entry[0]
+                                                 for entry in self.queue]
+            finally:
+                self.condition.release()
+            return '\t'.join(['ok'] + names)
+        if len(fields) == 1 and self.transport.parse(command):
+            return 'ok'
+        return 'error\tunknown request'
+
+    def stop(self):
+        # Stop playing and forget the queue, CONDITION being held.
+        del self.queue[:]
+        if self.current is not None:
+            self.transport.stop()
+
+    def decoder(self, name):
+        # Return a decoder for NAME, decoding again only if it changed.
+        import copy
+        status = os.stat(name)
+        self.cache_lock.acquire()
+        try:
+            entry = self.cache.get(name)
+            if (entry is None or entry[0] != status.st_mtime
+                    or entry[1] != status.st_size):
+                entry = (status.st_mtime, status.st_size,
+                         self.decode(name, copy.copy(self.run)))
+                self.cache[name] = entry
+            if name in self.recent:
+                self.recent.remove(name)
+            self.recent.append(name)
+            while len(self.recent) > CACHE_SIZE:
+                del self.cache[self.recent.pop(0)]
+        finally:
+            self.cache_lock.release()
+        return entry[2]
+
+def request(path, fields):
+    # Send FIELDS as one request to the daemon listening on PATH, and
+    # return its reply fields.
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    connection.connect(path)
+    try:
+        connection.sendall('\t'.join(fields) + '\n')
+        return connection.makefile('r').readline().rstrip('\n').split('\t')
+    finally:
+        connection.close()
@@ -13,32 +13,34 @@ class Verbose(midi.Processor):
         self.write = write
         self.flags = flags
         self.bar = 0
+        self.run = None
 
     def header(self, header):
+        self.run = header.run
         self.write("Format %d, division %d\n"
                    % (header.midi_file_format, header.division))
 
     def delay(self, delta):
-        if not midi.run.mute:
-            if midi.run.bar != self.bar:
-                if midi.run.beats_per_bar == 1:
-                    self.write("%% beat %d\n" % (midi.run.bar + 1))
+        if not self.run.mute and self.run.bar is not None:
+            if self.run.bar != self.bar:
+                if self.run.beats_per_bar == 1:
+                    self.write("%% beat %d\n" % (self.run.bar + 1))
                 else:
-                    self.write("%% bar %d\n" % (midi.run.bar + 1))
-                self.bar = midi.run.bar
+                    self.write("%% bar %d\n" % (self.run.bar + 1))
+                self.bar = self.run.bar
         if self.flags & midi.DUMP_DELTAS:
             self.write('%4d  ' % delta)
 
     def meta_event_text(self, track, text, message):
         if self.flags & midi.DUMP_METAS:
             self.write('trk%-2d %s: %s\n'
-                       % (track.number, message, text.rstrip()))
+                       % (track.number, message, text.tobytes().rstrip()))
 
     def meta_event_binary(self, track, bytes, message):
         if self.flags & midi.DUMP_METAS:
             write = self.write
             write('trk%-2d %s:' % (track.number, message))
-            for byte in bytes:
+            for byte in bytes.tolist():
                 write(' %02x' % byte)
             write('\n')
 
@@ -88,8 +90,12 @@ class Dumper(Verbose):
             message = 'sysex-cont'
         else:
             message = 'sysex'
-        parse_bytes (track, parse_intvar (track),
-                     self.flags & midi.DUMP_EVENTS, message)
+        if self.flags & midi.DUMP_EVENTS:
+            write = self.write
+            write('trk%-2d %s:' % (track.number, message))
+            for byte in bytes.tolist():
+                write(' %02x' % byte)
+            write('\n')
 
     def end_of_track(self, track):
         if self.flags & midi.DUMP_METAS:
@@ -99,8 +105,10 @@ class Dumper(Verbose):
         if self.flags & midi.DUMP_METAS:
             self.write('trk%-2d Set Tempo %d\n' % (track.number, tempo))
 
-    def undefined(self, track, buffer):
+    def undefined(self, track, event, buffer):
         if self.flags & midi.DUMP_EVENTS:
-            self.write('trk%-2d Undefined %02x:' % (track.number, event))
-            #while (...):
-            #    write(' %02x' % ord(self.buffer[self.position]))
+            write = self.write
+            write('trk%-2d Undefined %02x:' % (track.number, event))
+            for byte in buffer.tolist():
+                write(' %02x' % byte)
+            write('\n')
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Lazy event streams.
+
+Rather than pushing events into a Processor, a Stream lets a script pull
+them, one small Event record at a time, either for a single track or
+merged in time order over many tracks.  Events are decoded only as they
+get asked for, so a script which stops early, after a few bars or at the
+first event found, does not pay for the rest of the file.  Streams chain
+filter, map and window stages, each as lazy as the stream it reads.  Put
+windows first, so they stop decoding as soon as they end:
+
+    for event in decoder.events().bars(0, 8).kinds('note_on').channels(9):
+        ...
+"""
+
+import copy, itertools
+import midi
+
+class Event(object):
+    # TICK counts from the start of the file, TRACK is the decoder Track.
+    # KIND is the name of the Processor callback which would receive this
+    # event, and ARGUMENTS the callback arguments following the track.
+    # CHANNEL repeats the first argument of channel events, and is None for
+    # other events.  Sysex and meta-event data are memoryviews into the
+    # file buffer, copy them before keeping them after the decoder is gone.
+
+    __slots__ = ('tick', 'track', 'kind', 'channel', 'arguments')
+
+    def __init__(self, tick, track, kind, channel, arguments):
+        self.tick = tick
+        self.track = track
+        self.kind = kind
+        self.channel = channel
+        self.arguments = arguments
+
+    def __repr__(self):
+        return 'Event(%d, %d, %r, %r)' % (self.tick, self.track.number,
+                                          self.kind, self.arguments)
+
+    def send(self, processor):
+        getattr(processor, self.kind)(self.track, *self.arguments)
+
+class Collector(midi.Processor):
+    # Turn callbacks from Track.dispatch_event into Event records, appended
+    # to EVENTS.  TICK should be set by the caller before each event.
+
+    def __init__(self):
+        self.tick = 0
+        self.events = []
+
+    def add(self, track, kind, channel, arguments):
+        self.events.append(Event(self.tick, track, kind, channel, arguments))
+
+    def note_off(self, track, channel, pitch, velocity):
+        self.add(track, 'note_off', channel, (channel, pitch, velocity))
+
+    def note_on(self, track, channel, pitch, velocity):
+        self.add(track, 'note_on', channel, (channel, pitch, velocity))
+
+    def key_pressure(self, track, channel, pitch, pressure):
+        self.add(track, 'key_pressure', channel, (channel, pitch, pressure))
+
+    def parameter(self, track, channel, parameter, setting):
+        self.add(track, 'parameter', channel, (channel, parameter, setting))
+
+    def program(self, track, channel, program):
+        self.add(track, 'program', channel, (channel, program))
+
+    def channel_pressure(self, track, channel, pressure):
+        self.add(track, 'channel_pressure', channel, (channel, pressure))
+
+    def pitch_wheel(self, track, channel, wheel):
+        self.add(track, 'pitch_wheel', channel, (channel, wheel))
+
+    def sysex(self, track, bytes, continuation=False):
+        self.add(track, 'sysex', None, (bytes, continuation))
+
+    def meta_event_text(self, track, text, message):
+        self.add(track, 'meta_event_text', None, (text, message))
+
+    def meta_event_binary(self, track, bytes, message):
+        self.add(track, 'meta_event_binary', None, (bytes, message))
+
+    def end_of_track(self, track):
+        self.add(track, 'end_of_track', None, ())
+
+    def set_tempo(self, track, tempo):
+        self.add(track, 'set_tempo', None, (tempo,))
+
+    def undefined(self, track, *arguments):
+        self.add(track, 'undefined', None, arguments)
+
+def track_events(track):
+    # Generate events of TRACK.  The track is copied first, only positions
+    # get copied, not the file, so many generators and the decoder itself
+    # may walk the same track independently.
+    track = copy.copy(track)
+    track.rewind()
+    collector = Collector()
+    events = collector.events
+    dispatch_event = midi.dispatch_event
+    tick = 0
+    while track.delta is not None:
+        tick += track.delta
+        collector.tick = tick
+        dispatch_event(track, collector)
+        for event in events:
+            yield event
+        del events[:]
+
+def merged_events(tracks):
+    # Generate events of all TRACKS in time order.  Events at the same tick
+    # come by track order, as for Decoder.parallel_process.
+    import heapq
+    heap = []
+    for index, track in enumerate(tracks):
+        generator = track_events(track)
+        for event in generator:
+            heap.append((event.tick, index, event, generator))
+            break
+    heapq.heapify(heap)
+    while heap:
+        tick, index, event, generator = heap[0]
+        yield event
+        for event in generator:
+            heapq.heapreplace(heap, (event.tick, index, event, generator))
+            break
+        else:
+            heapq.heappop(heap)
+
+class Stream:
+    # An iterable over EVENTS, having the given number of TICKS_PER_BAR.
+    # Window stages need events in time order, and Event records; filter
+    # and map stages do not care.
+
+    def __init__(self, events, ticks_per_bar=None):
+        self.events = events
+        self.ticks_per_bar = ticks_per_bar
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def derive(self, events):
+        return Stream(events, self.ticks_per_bar)
+
+    def filter(self, predicate):
+        # Keep events for which PREDICATE is true.
+        return self.derive(itertools.ifilter(predicate, self.events))
+
+    def map(self, function):
+        # Replace each event by what FUNCTION returns for it.
+        return self.derive(itertools.imap(function, self.events))
+
+    def kinds(self, *kinds):
+        # Keep events of the given KINDS, callback names.
+        kinds = frozenset(kinds)
+        return self.filter(lambda event: event.kind in kinds)
+
+    def channels(self, *channels):
+        # Keep channel events for the given CHANNELS.
+        channels = frozenset(channels)
+        return self.filter(lambda event: event.channel in channels)
+
+    def window(self, start=None, end=None):
+        # Keep events from tick START included to tick END excluded, and
+        # stop decoding once END is reached.
+        events = self.events
+        if start is not None:
+            events = itertools.dropwhile(lambda event: event.tick < start,
+                                         events)
+        if end is not None:
+            events = itertools.takewhile(lambda event: event.tick < end,
+                                         events)
+        return self.derive(events)
+
+    def bars(self, first=None, last=None):
+        # Keep events from bar FIRST included to bar LAST excluded, both
+        # counted from 0.
+        start = end = None
+        if first is not None:
+            start = first * self.ticks_per_bar
+        if last is not None:
+            end = last * self.ticks_per_bar
+        return self.window(start, end)
+
+    def windows(self, size=None):
+        # Generate (START, EVENTS) for each span of SIZE ticks, bars by
+        # default, having events.  START is the first tick of the span.
+        if size is None:
+            size = self.ticks_per_bar
+        for start, events in itertools.groupby(
+                self.events, lambda event: event.tick // size):
+            yield start * size, list(events)
+
+    def process(self, processor, header=None):
+        # Push remaining events into PROCESSOR, with delays between them,
+        # after HEADER if given.  Time starts at the first event.
+        if header is not None:
+            processor.header(header)
+        tick = None
+        for event in self.events:
+            if tick is not None and event.tick > tick:
+                processor.delay(event.tick - tick)
+            tick = event.tick
+            event.send(processor)
+
+def events(decoder, tracks=None):
+    # Return a Stream of events from DECODER, merged over all tracks, or
+    # only over those numbered in TRACKS.  Tracks not selected are not even
+    # decoded.
+    selected = decoder.tracks
+    if tracks is not None:
+        selected = [track for track in selected if track.number in tracks]
+    ticks_per_bar = decoder.header.division * decoder.run.beats_per_bar
+    if len(selected) == 1:
+        return Stream(track_events(selected[0]), ticks_per_bar)
+    return Stream(merged_events(selected), ticks_per_bar)
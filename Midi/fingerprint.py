@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Content fingerprints and duplicate detection.
+
+A Fingerprinter hashes the merged event stream of a file, normalized so
+that text and other metas, the order of tracks, running status or note
+off encoding, and the choice of division make no difference.  Times are
+rescaled to a fixed number of ticks per quarter note, and events at the
+same time are sorted by channel before being hashed.  Optionally, each bar
+gets its own fingerprint, so files sharing most of their bars may be
+found as well.
+"""
+
+import hashlib, struct
+import midi
+
+# Ticks per quarter note, once rescaled.
+RESOLUTION = 960
+
+# Bytes kept from each bar digest.
+BAR_DIGEST_SIZE = 8
+
+class Fingerprinter(midi.Processor):
+    # Hash events as given by Decoder.parallel_process.  When BEATS_PER_BAR
+    # is not None, also hash each bar of that many quarter notes, BARS
+    # then lists bar digests, or None for bars without any event.
+
+    def __init__(self, beats_per_bar=None):
+        self.beats_per_bar = beats_per_bar
+        self.hash = hashlib.sha1()
+        self.bars = []
+        self.bar = None                 # bar being hashed
+        self.bar_hash = None
+        self.division = None
+        self.tick = 0                   # file ticks
+        self.previous = 0               # rescaled tick of previous group
+        self.group = []                 # events at current tick
+        self.count = 0
+
+    def header(self, header):
+        self.division = header.division & 0x7fff
+
+    def delay(self, delta):
+        if delta and self.group:
+            self.flush()
+        self.tick += delta
+
+    def flush(self):
+        # Hash events at the current tick.
+        tick = (self.tick * RESOLUTION + self.division // 2) // self.division
+        self.group.sort()
+        data = ''.join([struct.pack('>BBHI', *event)
+                        for event in self.group])
+        self.count += len(self.group)
+        self.group = []
+        self.hash.update(struct.pack('>I', tick - self.previous) + data)
+        self.previous = tick
+        if self.beats_per_bar is not None:
+            size = RESOLUTION * self.beats_per_bar
+            bar = tick // size
+            if bar != self.bar:
+                self.end_bar()
+                while len(self.bars) < bar:
+                    self.bars.append(None)
+                self.bar = bar
+                self.bar_hash = hashlib.sha1()
+            self.bar_hash.update(struct.pack('>I', tick - bar * size) + data)
+
+    def end_bar(self):
+        if self.bar_hash is not None:
+            self.bars.append(self.bar_hash.digest()[:BAR_DIGEST_SIZE])
+            self.bar_hash = None
+
+    def digest(self):
+        # Return the fingerprint for all events seen, as a hex string.
+        if self.group:
+            self.flush()
+        self.end_bar()
+        return self.hash.hexdigest()
+
+    # Notes off are all alike, whatever their encoding.
+
+    def note_off(self, track, channel, pitch, velocity):
+        self.group.append((channel, 0x80, pitch, 0))
+
+    def note_on(self, track, channel, pitch, velocity):
+        if velocity == 0:
+            self.group.append((channel, 0x80, pitch, 0))
+        else:
+            self.group.append((channel, 0x90, pitch, velocity))
+
+    def key_pressure(self, track, channel, pitch, pressure):
+        self.group.append((channel, 0xa0, pitch, pressure))
+
+    def parameter(self, track, channel, parameter, setting):
+        self.group.append((channel, 0xb0, parameter, setting))
+
+    def program(self, track, channel, program):
+        self.group.append((channel, 0xc0, program, 0))
+
+    def channel_pressure(self, track, channel, pressure):
+        self.group.append((channel, 0xd0, pressure, 0))
+
+    def pitch_wheel(self, track, channel, wheel):
+        self.group.append((channel, 0xe0, wheel + 0x2000, 0))
+
+    def sysex(self, track, bytes, continuation=False):
+        import zlib
+        self.group.append((0, 0xf0, len(bytes) & 0xffff,
+                           zlib.crc32(bytes.tobytes()) & 0xffffffff))
+
+    def set_tempo(self, track, tempo):
+        self.group.append((0, 0xff, 0x51, tempo))
+
+def fingerprint(decoder, beats_per_bar=None):
+    # Return a Fingerprinter having seen all events of DECODER.
+    fingerprinter = Fingerprinter(beats_per_bar)
+    decoder.parallel_process(fingerprinter)
+    fingerprinter.digest()
+    return fingerprinter
+
+def fingerprint_file(arguments):
+    # Return (NAME, DIGEST, BARS) for file NAME, given as (NAME,
+    # BEATS_PER_BAR).  If NAME cannot be decoded, DIGEST is None and BARS
+    # is an error message.  This runs within pool workers.
+    name, beats_per_bar = arguments
+    from main import decode_file
+    try:
+        fingerprinter = fingerprint(decode_file(name, midi.Run()),
+                                    beats_per_bar)
+    except Exception, exception:
+        # One odd file should not abort a whole library.
+        return name, None, str(exception) or exception.__class__.__name__
+    return name, fingerprinter.digest(), fingerprinter.bars
+
+def clusters(results, threshold=None, common=50):
+    # Return (EXACT, SIMILAR) from RESULTS, a list of (NAME, DIGEST, BARS).
+    # EXACT lists groups of names having the same digest.  If THRESHOLD is
+    # not None, SIMILAR lists (SHARE, NAMES) for other groups of files
+    # sharing at least THRESHOLD of their distinct non-empty bars, SHARE
+    # being the smallest share between linked files.  Bars found in more
+    # than COMMON files do not link files, as they are usually trivial.
+    results = [entry for entry in results if entry[1] is not None]
+    by_digest = {}
+    for name, digest, bars in results:
+        by_digest.setdefault(digest, []).append(name)
+    exact = [sorted(names) for names in by_digest.values()
+             if len(names) > 1]
+    exact.sort()
+    if threshold is None:
+        return exact, []
+    # Keep one representative per digest.
+    sets = []
+    names = []
+    seen = {}
+    for name, digest, bars in results:
+        if digest not in seen:
+            seen[digest] = None
+            names.append(name)
+            sets.append(dict.fromkeys([bar for bar in bars
+                                       if bar is not None]))
+    holders = {}
+    for index, bars in enumerate(sets):
+        for bar in bars:
+            holders.setdefault(bar, []).append(index)
+    shared = {}
+    for indices in holders.itervalues():
+        if len(indices) <= common:
+            for position, first in enumerate(indices):
+                for second in indices[position+1:]:
+                    key = first, second
+                    shared[key] = shared.get(key, 0) + 1
+    # Link files into groups, remembering the weakest link.
+    parents = range(len(sets))
+    def find(index):
+        while parents[index] != index:
+            parents[index] = parents[parents[index]]
+            index = parents[index]
+        return index
+    weakest = {}
+    for (first, second), count in shared.iteritems():
+        share = float(count) / (len(sets[first]) + len(sets[second])
+                                - count)
+        if share >= threshold:
+            first_root = find(first)
+            second_root = find(second)
+            root = min(first_root, second_root)
+            parents[first_root] = parents[second_root] = root
+            weakest[root] = min(share, weakest.get(first_root, 1.),
+                                weakest.get(second_root, 1.))
+    groups = {}
+    for index in range(len(sets)):
+        groups.setdefault(find(index), []).append(names[index])
+    similar = [(weakest[root], sorted(group))
+               for root, group in groups.iteritems() if len(group) > 1]
+    similar.sort()
+    similar.reverse()
+    return exact, similar
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Index of sounding notes.
+
+A NoteIndex holds all notes of a decoded file as intervals of ticks, sorted
+by start tick, with a tree of maximum end ticks over them.  This answers
+what is sounding at a given tick, or over a range of ticks, in logarithmic
+time plus the size of the answer.
+"""
+
+from bisect import bisect_left
+
+class NoteIndex:
+
+    def __init__(self, decoder):
+        import arrays
+        tabulator = arrays.tabulate(decoder)
+        # Walk events in merged time order, pairing note ons and note offs
+        # per channel and pitch, first in first out.
+        ticks = tabulator.ticks
+        order = sorted(range(len(ticks)), key=ticks.__getitem__)
+        pending = {}
+        notes = []
+        for index in order:
+            type = tabulator.types[index]
+            if type != 0x80 and type != 0x90:
+                continue
+            key = tabulator.channels[index], tabulator.data1[index]
+            if type == 0x90 and tabulator.data2[index] > 0:
+                note = [ticks[index], None, tabulator.tracks[index],
+                        key[0], key[1], tabulator.data2[index]]
+                pending.setdefault(key, []).append(note)
+                notes.append(note)
+            elif pending.get(key):
+                pending[key].pop(0)[1] = ticks[index]
+        # Notes never turned off last until the end of the file.
+        if order:
+            last = ticks[order[-1]] + 1
+        else:
+            last = 0
+        for note in notes:
+            if note[1] is None:
+                note[1] = last
+        # NOTES is a list of (START, END, TRACK, CHANNEL, PITCH, VELOCITY),
+        # sorted by START.  STARTS is the list of all START.
+        self.notes = [tuple(note) for note in notes]
+        self.starts = [note[0] for note in self.notes]
+        # ENDS is a tree kept in a list, with the maximum END of both
+        # children in each node, and the notes as leaves from SIZE on.
+        size = 1
+        while size < len(self.notes):
+            size *= 2
+        self.size = size
+        ends = [-1] * (2 * size)
+        for counter, note in enumerate(self.notes):
+            ends[size + counter] = note[1]
+        for node in range(size - 1, 0, -1):
+            ends[node] = max(ends[2 * node], ends[2 * node + 1])
+        self.ends = ends
+
+    def sounding(self, tick):
+        # Return notes being heard at TICK, that is, started at or before
+        # TICK but not ended yet.
+        return self.search(bisect_left(self.starts, tick + 1), tick)
+
+    def overlapping(self, first, last):
+        # Return notes heard somewhere from FIRST tick to LAST tick
+        # excluded.
+        return self.search(bisect_left(self.starts, last), first)
+
+    def search(self, limit, tick):
+        # Return notes among the LIMIT first having an END after TICK.
+        if limit == 0:
+            return []
+        ends = self.ends
+        size = self.size
+        found = []
+        stack = [(1, 0, size)]
+        while stack:
+            node, low, high = stack.pop()
+            if low >= limit or ends[node] <= tick:
+                continue
+            if node >= size:
+                found.append(self.notes[low])
+                continue
+            middle = (low + high) // 2
+            stack.append((2 * node + 1, middle, high))
+            stack.append((2 * node, low, middle))
+        return found
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Gapless loops over a range of bars.
+
+A Loop decodes a range of bars once, into lists of events with their
+delta times, ready to be sent again and again.  A prelude brings a player
+to the state at the loop start: sysex sent before, the latest tempo,
+programs, controllers, pressure and pitch wheel values, then notes held
+over the start.  At each wrap, notes held at the loop end are turned off,
+settings which changed within the loop are brought back, and held notes
+are sounded again, all on time, as the loop end is the next loop start.
+"""
+
+from transport import keep_parameter, restoring
+
+# Default tempo, in micro-seconds per quarter note.
+DEFAULT_TEMPO = 500000
+
+def is_note_off(event):
+    return (event.kind == 'note_off'
+            or event.kind == 'note_on' and not event.arguments[2])
+
+class Loop:
+    # Bars of DECODER from FIRST included to LAST excluded, both counted
+    # from 0.  Without LAST, the loop goes to the end of the bar holding
+    # the last event.  Lists hold (DELTA, NAME, TRACK, ARGUMENTS), NAME
+    # being a Processor callback or None for a delay alone.
+
+    def __init__(self, decoder, first=0, last=None):
+        self.header = decoder.header
+        ticks_per_bar = decoder.header.division * decoder.run.beats_per_bar
+        start = first * ticks_per_bar
+        if last is None:
+            ticks = decoder.timing().ticks
+            last = max(first + 1, -(-ticks // ticks_per_bar))
+        end = last * ticks_per_bar
+        # SETTINGS maps (NAME, CHANNEL, NUMBER) to (TRACK, VALUE), as for
+        # the Tracker, and NOTES maps (CHANNEL, PITCH) to (TRACK, VELOCITY).
+        self.settings = {}
+        self.notes = {}
+        self.prelude = []
+        self.body = []
+        tick = start
+        opening = None
+        for event in decoder.events().window(None, end):
+            if event.tick >= start and opening is None:
+                opening = self.opening()
+            self.follow(event)
+            if event.tick < start:
+                if event.kind == 'sysex':
+                    self.prelude.append((0, 'sysex', event.track,
+                                        event.arguments))
+            elif (event.tick == start and is_note_off(event)
+                    and event.arguments[:2] in opening[1]):
+                # A note ending right at the start needs no sounding again.
+                del opening[1][event.arguments[:2]]
+            elif event.kind != 'end_of_track':
+                self.body.append((event.tick - tick, event.kind,
+                                  event.track, event.arguments))
+                tick = event.tick
+        if opening is None:
+            opening = self.opening()
+        start_settings, start_notes = opening
+        self.prelude += self.restore({}, start_settings)
+        self.prelude += self.strike(start_notes)
+        # Turn off notes still held when the loop ends.
+        self.ending = [(end - tick, None, None, ())]
+        for (channel, pitch), (track, velocity) in sorted(
+                self.notes.items()):
+            self.ending.append((0, 'note_off', track, (channel, pitch, 0)))
+        self.wrap = (self.restore(self.settings, start_settings)
+                     + self.strike(start_notes))
+
+    def opening(self):
+        return dict(self.settings), dict(self.notes)
+
+    def follow(self, event):
+        # Update settings and held notes after EVENT.
+        kind = event.kind
+        arguments = event.arguments
+        if is_note_off(event):
+            if arguments[:2] in self.notes:
+                del self.notes[arguments[:2]]
+        elif kind == 'note_on':
+            self.notes[arguments[:2]] = event.track, arguments[2]
+        elif kind == 'parameter':
+            keep_parameter(self.settings, event.track, *arguments)
+        elif kind in ('program', 'channel_pressure', 'pitch_wheel'):
+            self.settings[kind, arguments[0], None] = (
+                event.track, arguments[1])
+        elif kind == 'set_tempo':
+            self.settings[kind, None, None] = event.track, arguments[0]
+
+    def restore(self, current, wanted):
+        # Return events bringing settings from CURRENT to WANTED.
+        events = []
+        key = 'set_tempo', None, None
+        if key in wanted:
+            track, value = wanted[key]
+            if key not in current or current[key][1] != value:
+                events.append((0, 'set_tempo', track, (value,)))
+        elif key in current:
+            events.append((0, 'set_tempo', current[key][0],
+                           (DEFAULT_TEMPO,)))
+        for name, track, arguments in restoring(current, wanted):
+            events.append((0, name, track, arguments))
+        return events
+
+    def strike(self, notes):
+        return [(0, 'note_on', track, (channel, pitch, velocity))
+                for (channel, pitch), (track, velocity)
+                in sorted(notes.items())]
+
+    def play(self, processor, count=None):
+        # Play the loop COUNT times through PROCESSOR, or for ever if COUNT
+        # is None.  Callbacks are bound once, so each repetition only walks
+        # lists.
+        prelude = self.bind(self.prelude, processor)
+        body = self.bind(self.body + self.ending, processor)
+        wrap = self.bind(self.wrap, processor)
+        delay = processor.delay
+        processor.header(self.header)
+        events = prelude
+        repetition = 0
+        while count is None or repetition < count:
+            for entries in events, body:
+                for delta, callback, track, arguments in entries:
+                    if delta:
+                        delay(delta)
+                    if callback is not None:
+                        callback(track, *arguments)
+            events = wrap
+            repetition += 1
+
+    def bind(self, entries, processor):
+        bound = []
+        for delta, name, track, arguments in entries:
+            if name is None:
+                callback = None
+            else:
+                callback = getattr(processor, name)
+            bound.append((delta, callback, track, arguments))
+        return bound
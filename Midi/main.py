@@ -6,20 +6,34 @@
 """\
 Play a MIDI file.
 
-Usage: joue [OPTION]... [INPUT]
+Usage: joue [OPTION]... [INPUT]...
 
 Mandatory arguments to long options are mandatory for short options too.
 
   -p, --port=PORT        use said MIDI port, if a number, go through ALSA
+  -r, --rate=BYTES       pace raw MIDI output at BYTES per second, 0 for none
+  -N, --note-offs        silence by note offs, for ports ignoring All Notes Off
   -b, --bars=EXCERPT     play bars according to EXCERPT specification
+  -L, --loop=COUNT       play the EXCERPT COUNT times without gaps, 0 for ever
   -c, --check            check MIDI file without performing it
+  -T, --timing           only report durations, event and bar counts
+  -M, --matrix           only report notes per bar and track
   -s, --speed=FACTOR     adjust speed, bigger the slower, default is 100
   -f, --freeze-channel   inhibit all program changes
   -z, --channel-zero     force all notes on channel zero
   -t, --transpose=NUM    number of semi-tones of transposition
   -d, --drum=CHANNEL     drum channel, not to be transposed, default is 9
+  -m, --map=IN..OUT      map channels IN into channel OUT
+  -v, --velocity=FACTOR  scale note velocities, default is 100
+  -n, --thin=MS          thin controller values to one per MS milliseconds
   -D, --debug=BITS       turn on debug bits, default is 8
   -k, --console          use console beeper simultaneously to MIDI port
+  -w, --wave=FILE        render into a WAV file instead of playing
+  -l, --playlist=FILE    play files listed in FILE, before INPUTs
+  -i, --interactive      obey commands from Standard Input while playing
+  -S, --serve=SOCKET     stay resident, playing files as requested on SOCKET
+  -C, --connect=SOCKET   have the player resident on SOCKET play INPUTs
+  -e, --request=REQUEST  with -C, send REQUEST instead, followed by INPUTs
       --help             display this help and exit
       --version          output version information and exit
 
@@ -27,10 +41,30 @@ BITS are 1 deltas, 2 MIDI notes, 4 other MIDI events, 8 meta-events.
 EXCERPT is [FACTORx][[FIRST]-][LAST] to select from FIRST bar to LAST bar,
 both counted from 1, and LAST included.  FACTOR says how many beats per bar,
 defaulting to 1.  Play from beginning if FIRST is omitted, through end if
-LAST is omitted.  If only LAST is given, play only that bar.
+LAST is omitted.  If only LAST is given, play only that bar.  Bars reported
+by -M follow time signatures instead, give -b the FACTOR the report tells.
 
-With no FILE or if FILE is -, read Standard Input.  Files suffixed with
-`.gz' files are automatically uncompressed.
+IN is either a CHANNEL or FIRST-LAST, all channels counted from 0.  Option -m
+may be repeated, and -z is the same as -m 0-15..0.
+
+With no INPUT or if INPUT is -, read Standard Input.  Files suffixed with
+`.gz' files are automatically uncompressed.  Many INPUTs, or a playlist
+FILE listing one file name per line, are played back to back without gaps.
+
+With -i, commands are read one per line: an empty line or `p' pauses or
+resumes, `b BAR' goes to BAR, `t SECONDS' goes to SECONDS from the start,
+`s FACTOR' changes the speed as with -s, and `q' quits.  INPUT files should
+then be given, as Standard Input is not available for MIDI data.
+
+With -L, the EXCERPT selected by -b, or the whole file, is decoded once and
+repeated with exact timing, state at its first bar being restored at each
+repetition.  Only the first INPUT is looped, and -i may not be used.
+
+With -S, the MIDI port is opened once, and files stay decoded between
+requests.  INPUTs are decoded in advance.  Other options apply to all files
+played, but -c and -w may not be used.  With -C, INPUTs replace what is
+playing.  REQUEST may be `queue', to play INPUTs after those already
+queued, `skip', `stop', `status', `quit', or a command as for -i.
 """
 
 # TODO for this module:
@@ -47,34 +81,43 @@ With no FILE or if FILE is -, read Standard Input.  Files suffixed with
 #
 # Add a fake track for bars, and report them as we go on.
 #
-# An option to produce track timing only.
-#
 # An option to produce a merged format 0 from format 1.
 #
 # An option to merge many format 0 and format 1 inputs into a single type 1,
 # with control over tracks and channels.
 #
-# Compute an annotated bar and track matrix, with catchup code at each bar.
-#
 # Make it interactive to play selected bars and tracks.  Think `fdesign'.
 
 import sys
 
-#  -m, --map=IN..OUT      map IN selection into OUT selection
-
 def main(*arguments):
     import midi
     # Decode program options.
+    run = midi.Run()
     port = None
     check_mode = False
+    timing = False
+    matrix = False
+    interactive = False
+    looping = False
+    serve = None
+    connect = None
+    request = 'play'
+    loop = None
     console = False
+    wave = None
+    playlist = None
+    rate = 3125
+    bulk = True
     debug = midi.DUMP_METAS
     import getopt
     options, arguments = getopt.getopt(
-        arguments, 'D:b:cd:fkm:p:s:t:x:z',
-        ('bars=', 'channel-zero', 'check', 'console', 'debug=', 'drum=',
-         'extract=', 'freeeze-channel', 'help', 'map=' 'port=', 'speed=',
-         'transpose=', 'version'))
+        arguments, 'C:D:L:MNS:Tb:cd:e:fikl:m:n:p:r:s:t:v:w:x:z',
+        ('bars=', 'channel-zero', 'check', 'connect=', 'console', 'debug=',
+         'drum=', 'extract=', 'freeze-channel', 'help', 'interactive',
+         'loop=', 'map=', 'matrix', 'note-offs', 'playlist=', 'port=', 'rate=',
+         'request=', 'serve=', 'speed=', 'thin=', 'timing', 'transpose=',
+         'velocity=', 'version', 'wave='))
     for option, value in options:
         if option == '--help':
             sys.stdout.write(__doc__)
@@ -83,51 +126,130 @@ def main(*arguments):
             from Midi import __package__, __version__
             sys.stdout.write("Free %s %s\n" % (__package__, __version__))
             sys.exit(0)
-        if option in ('-D', '--debug'):
+        if option in ('-C', '--connect'):
+            connect = value
+        elif option in ('-D', '--debug'):
             debug = int(value)
+        elif option in ('-L', '--loop'):
+            looping = True
+            loop = int(value) or None
+        elif option in ('-M', '--matrix'):
+            matrix = True
+        elif option in ('-N', '--note-offs'):
+            bulk = False
+        elif option in ('-S', '--serve'):
+            serve = value
+        elif option in ('-T', '--timing'):
+            timing = True
         elif option in ('-b', '--bars'):
-            decode_bars(value)
+            decode_bars(value, run)
         elif option in ('-c', '--check'):
             check_mode = True
         elif option in ('-d', '--drum'):
-            midi.run.drum_channel = int(value)
-        elif option in ('-f', '--freeze_channel'):
-            midi.run.freeze_channel = True
+            run.drum_channel = int(value)
+        elif option in ('-e', '--request'):
+            request = value
+        elif option in ('-f', '--freeze-channel'):
+            run.freeze_channel = True
+        elif option in ('-i', '--interactive'):
+            interactive = True
         elif option in ('-k', '--console'):
             console = True
+        elif option in ('-l', '--playlist'):
+            playlist = value
         elif option in ('-m', '--map'):
-            pass
+            decode_map(value, run)
+        elif option in ('-n', '--thin'):
+            run.thin = int(value) / 1000.
         elif option in ('-p', '--port'):
             port = int(value)
+        elif option in ('-r', '--rate'):
+            rate = int(value)
         elif option in ('-s', '--speed'):
-            midi.run.speed_factor = int(value)
+            run.speed_factor = int(value)
         elif option in ('-t', '--transpose'):
-            midi.run.transpose = int(value)
+            run.transpose = int(value)
+        elif option in ('-v', '--velocity'):
+            run.velocity = int(value)
+        elif option in ('-w', '--wave'):
+            wave = value
         elif option in ('-x', '--extract'):
-            midi.run.extract = int(value)
+            run.extract = int(value)
         elif option in ('-z', '--channel-zero'):
-            midi.run.channel_zero = True
+            run.channel_map = [0] * 16
+    if serve is not None and (check_mode or wave is not None):
+        # The daemon only plays.
+        usage()
+    if looping and interactive:
+        # Loops are not played through a Transport.
+        usage()
     # Launch wanted processing.
-    if not arguments:
-        midi_file = midi.Decoder(sys.stdin)
-    elif len(arguments) == 1:
-        if arguments[0].endswith('.gz'):
-            import gzip
-            midi_file = midi.Decoder(gzip.open(arguments[0]))
-        else:
-            midi_file = midi.Decoder(file(arguments[0]))
+    if connect is not None:
+        import os, daemon
+        reply = daemon.request(connect, [request] + [
+            os.path.abspath(name) for name in arguments])
+        if reply[0] != 'ok':
+            sys.stderr.write("%s\n" % ': '.join(reply[1:]))
+            sys.exit(1)
+        for name in reply[1:]:
+            sys.stdout.write("%s\n" % name)
+        return
+    if timing:
+        for name in arguments or ['-']:
+            decode_file(name, run).timing().report(sys.stdout.write, name)
+        return
+    if matrix:
+        for name in arguments or ['-']:
+            decode_file(name, run).matrix().report(sys.stdout.write, name)
+        return
+    if playlist is not None:
+        import playlist as module
+        arguments = module.read_playlist(playlist) + list(arguments)
+        if not arguments:
+            return
+    if serve is not None:
+        # Files get decoded by the daemon.
+        decoders = []
+    elif len(arguments) > 1:
+        import playlist as module
+        decoders = module.Prefetcher(arguments, decode_file, run)
+        def process(processor, serial=False):
+            module.play(decoders, processor, serial)
     else:
-        usage()
+        if arguments:
+            name = arguments[0]
+        else:
+            name = '-'
+        midi_file = decode_file(name, run)
+        decoders = [(name, midi_file)]
+        def process(processor, serial=False):
+            if serial:
+                midi_file.serial_process(processor)
+            else:
+                midi_file.parallel_process(processor)
     if check_mode:
         from dumper import Dumper
-        midi_file.serial_process(Dumper(flags=debug))
+        process(transformed(Dumper(flags=debug), run), True)
+    elif wave is not None:
+        from renderer import Renderer
+        renderer = Renderer(wave)
+        process(transformed(renderer, run))
+        renderer.close()
     else:
+        if interactive or serve is not None:
+            from transport import Transport
+            transport = Transport()
+            if interactive:
+                transport.serve(sys.stdin)
+        else:
+            transport = None
         if isinstance(port, int):
             from alsaport import AlsaPort
-            midiport = AlsaPort(port)
+            midiport = AlsaPort(port, transport)
         else:
             from midiport import MidiPort
-            midiport = MidiPort(port)
+            midiport = MidiPort(port, rate, transport, bulk)
+        players = [midiport]
         if debug or console:
             processor = midi.MultiProcessor()
             if debug:
@@ -135,37 +257,109 @@ def main(*arguments):
                 processor.add(Dumper(flags=debug))
             if console:
                 from console import Console
-                processor.add(Console())
+                players.append(Console(clock=transport))
+                processor.add(players[-1])
             processor.add(midiport)
         else:
             processor = midiport
-        midi_file.parallel_process(processor)
+        try:
+            if serve is not None:
+                import os, daemon
+                resident = daemon.Daemon(serve, transport,
+                                         transformed(processor, run),
+                                         players, decode_file, run)
+                for name in arguments:
+                    resident.decoder(os.path.abspath(name))
+                resident.serve()
+            elif looping:
+                # Only the first file gets looped.
+                from loop import Loop
+                for name, decoder in decoders:
+                    if isinstance(decoder, Exception):
+                        sys.stderr.write("%s: %s\n" % (name, decoder))
+                        continue
+                    Loop(decoder, run.start_bar or 0, run.end_bar).play(
+                        transformed(processor, run), loop)
+                    break
+            elif transport is None:
+                process(transformed(processor, run))
+            else:
+                for name, decoder in decoders:
+                    if isinstance(decoder, Exception):
+                        sys.stderr.write("%s: %s\n" % (name, decoder))
+                        continue
+                    transport.play(decoder, transformed(processor, run),
+                                   players)
+                    if transport.stopped:
+                        break
+        finally:
+            # Even when interrupted, leave no note sounding.
+            processor.silence()
 
-def decode_bars(argument):
-    import re
+def decode_file(name, run):
+    # Return a Decoder for file NAME, using RUN options.
     import midi
+    if name == '-':
+        return midi.Decoder(sys.stdin, run)
+    if name.endswith('.gz'):
+        import gzip
+        return midi.Decoder(gzip.open(name), run)
+    return midi.Decoder(file(name), run)
+
+def transformed(processor, run):
+    # Return PROCESSOR, preceded by the transforms asked by RUN options.
+    import transform
+    if run.thin is not None:
+        import thinner
+        processor = thinner.Thinner(processor, run.thin)
+    return transform.build(processor, transpose=run.transpose,
+                           drum_channel=run.drum_channel,
+                           channels=run.channel_map,
+                           freeze_program=run.freeze_channel,
+                           velocity=run.velocity)
+
+def decode_bars(argument, run):
+    import re
     match = re.match(r'([0-9]+x)?([0-9]*-)?([0-9]+)?$', argument)
     if match is None:
         usage()
     if match.group(1) is not None:
-        midi.run.beats_per_bar = int(match.group(1)[:-1]) or 1
+        run.beats_per_bar = int(match.group(1)[:-1]) or 1
     if match.group(2) is not None:
         start = int(match.group(2)[:-1])
         if start > 0:
             start -= 1
-        midi.run.start_bar = start
+        run.start_bar = start
         if match.group(3) is not None:
             end = int(match.group(3))
             if end > 0:
                 end -= 1
-            midi.run.end_bar = end + 1
+            run.end_bar = end + 1
     elif match.group(3) is not None:
         start = int(match.group(3))
         if start > 0:
             start -= 1
-        midi.run.start_bar = start
-        midi.run.end_bar = start + 1
-    sys.stderr.write("** %s %s\n" % (midi.run.start_bar, midi.run.end_bar))
+        run.start_bar = start
+        run.end_bar = start + 1
+    sys.stderr.write("** %s %s\n" % (run.start_bar, run.end_bar))
+
+def decode_map(argument, run):
+    import re
+    match = re.match(r'([0-9]+)(-([0-9]+))?\.\.([0-9]+)$', argument)
+    if match is None:
+        usage()
+    first = int(match.group(1))
+    if match.group(3) is None:
+        last = first
+    else:
+        last = int(match.group(3))
+    output = int(match.group(4))
+    if not 0 <= first <= last < 16 or not 0 <= output < 16:
+        usage()
+    if run.channel_map is None:
+        run.channel_map = range(16)
+    for channel in range(first, last + 1):
+        run.channel_map[channel] = output
 
 def usage():
     sys.stderr.write("Try `joue --help' for more information.\n")
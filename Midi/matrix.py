@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Bar and track matrix.
+
+A Matrix describes each bar of each track, after a single pass over the
+file: event and note counts, lowest and highest pitch, maximum polyphony,
+programs heard, and where decoding may restart at the bar.  Bars follow
+time signature meta-events, a signature change always starting a new bar,
+and are 4/4 until the first one.  Cells are kept in flat arrays indexed by
+BAR * TRACKS + COLUMN, COLUMN being the index of the track in the decoder.
+"""
+
+from array import array
+import midi
+
+class Scanner(midi.Processor):
+    # Fill one column of MATRIX, as events of its track are dispatched.
+    # TICK and POSITION, the buffer index of the event, should be set by
+    # the caller before each event, then advance() called.
+
+    def __init__(self, matrix, column):
+        self.matrix = matrix
+        self.column = column
+        self.tick = 0
+        self.position = 0
+        self.bar = -1
+        self.cell = None
+        # Notes held, by CHANNEL * 128 + PITCH, and program by channel.
+        self.held = [0] * (16 * 128)
+        self.sounding = 0
+        self.programs = [None] * 16
+        self.heard = None
+
+    def advance(self, running_status):
+        # Enter all bars up to TICK, the event about to be dispatched
+        # being the first one of each bar entered.
+        matrix = self.matrix
+        starts = matrix.starts
+        while (self.bar + 1 < len(starts)
+               and starts[self.bar + 1] <= self.tick):
+            self.end_bar()
+            self.bar += 1
+            self.cell = self.bar * len(matrix.numbers) + self.column
+            matrix.offsets[self.cell] = self.position
+            matrix.leads[self.cell] = self.tick - starts[self.bar]
+            matrix.statuses[self.cell] = running_status
+            matrix.polyphony[self.cell] = self.sounding
+            self.heard = {}
+        matrix.events[self.cell] += 1
+
+    def end_bar(self):
+        if self.heard:
+            self.matrix.programs[self.cell] = self.matrix.program_set(
+                self.heard)
+
+    def note_off(self, track, channel, pitch, velocity):
+        key = channel << 7 | pitch
+        if self.held[key]:
+            self.held[key] -= 1
+            self.sounding -= 1
+
+    def note_on(self, track, channel, pitch, velocity):
+        if velocity == 0:
+            self.note_off(track, channel, pitch, velocity)
+            return
+        matrix = self.matrix
+        cell = self.cell
+        self.held[channel << 7 | pitch] += 1
+        self.sounding += 1
+        matrix.notes[cell] += 1
+        if matrix.lows[cell] < 0 or pitch < matrix.lows[cell]:
+            matrix.lows[cell] = pitch
+        if pitch > matrix.highs[cell]:
+            matrix.highs[cell] = pitch
+        if self.sounding > matrix.polyphony[cell]:
+            matrix.polyphony[cell] = self.sounding
+        if channel != matrix.drum_channel:
+            self.heard[self.programs[channel]] = None
+
+    def program(self, track, channel, program):
+        self.programs[channel] = program
+
+class Matrix:
+    # STARTS gives the first tick of each bar, and SECONDS its time at the
+    # nominal speed.  NUMBERS lists track numbers, by column.  In cells,
+    # EVENTS and NOTES count events and note ons, LOWS and HIGHS give the
+    # pitch range of note ons, -1 if none, and POLYPHONY the most notes
+    # held at once, notes from previous bars included.  PROGRAMS indexes
+    # PROGRAM_SETS, sorted tuples of programs heard on non-drum channels,
+    # None standing for no program change yet.  OFFSETS is the buffer
+    # index of the first event at or after the bar start, or -1 if the
+    # track ended.  That event comes LEADS ticks after the bar start, and
+    # STATUSES gives the running status before it.
+
+    def __init__(self, decoder):
+        import skim
+        header = decoder.header
+        self.division = header.division
+        self.drum_channel = decoder.run.drum_channel
+        self.numbers = [track.number for track in decoder.tracks]
+        timing = skim.Timing(decoder)
+        tempos = []
+        signatures = []
+        for track in decoder.tracks:
+            ticks, events, track_tempos, track_signatures = (
+                skim.skim_track(track))
+            tempos += track_tempos
+            signatures += track_signatures
+        self.starts = self.bar_starts(timing.ticks, signatures)
+        self.seconds = array('d', [timing.seconds_at(tick, tempos)
+                                   for tick in self.starts])
+        size = len(self.starts) * len(self.numbers)
+        self.events = array('l', [0]) * size
+        self.notes = array('l', [0]) * size
+        self.lows = array('b', [-1]) * size
+        self.highs = array('b', [-1]) * size
+        self.polyphony = array('h', [0]) * size
+        self.program_sets = [()]
+        self.program_indices = {(): 0}
+        self.programs = array('h', [0]) * size
+        self.offsets = array('l', [-1]) * size
+        self.leads = array('l', [0]) * size
+        self.statuses = array('B', [0]) * size
+        dispatch_event = midi.dispatch_event
+        for column, track in enumerate(decoder.tracks):
+            scanner = Scanner(self, column)
+            track.rewind()
+            while track.delta is not None:
+                scanner.tick += track.delta
+                scanner.position = track.position
+                scanner.advance(track.running_status or 0)
+                dispatch_event(track, scanner)
+            scanner.end_bar()
+
+    def bar_starts(self, ticks, signatures):
+        # Return the first tick of each bar within TICKS.
+        division = self.division
+        if division & 0x8000:
+            # SMPTE times, make bars of one second.
+            per_bar = (256 - (division >> 8)) * (division & 0xff)
+            self.bar_length = per_bar
+            return array('l', range(0, max(ticks, 1), per_bar))
+        changes = sorted(signatures)
+        index = 0
+        starts = array('l')
+        tick = 0
+        per_bar = 4 * division
+        while tick < ticks or not starts:
+            while index < len(changes) and changes[index][0] <= tick:
+                change, numerator, power = changes[index]
+                per_bar = max(1, 4 * division * numerator >> power)
+                index += 1
+            starts.append(tick)
+            tick += per_bar
+            # A signature change cuts the bar short.
+            if index < len(changes) and changes[index][0] < tick:
+                tick = changes[index][0]
+        # Nominal length of the last bar.
+        self.bar_length = per_bar
+        return starts
+
+    def beats_per_bar(self):
+        # Return the FACTOR for option -b making it count the same bars,
+        # or None if bars vary in length or are not made of whole beats.
+        division = self.division
+        if division & 0x8000:
+            return None
+        lengths = dict.fromkeys([self.starts[bar + 1] - self.starts[bar]
+                                 for bar in range(len(self.starts) - 1)])
+        lengths[self.bar_length] = None
+        if len(lengths) != 1 or self.bar_length % division:
+            return None
+        return self.bar_length // division
+
+    def program_set(self, heard):
+        # Return the index of the set of programs in HEARD.
+        programs = tuple(sorted(heard))
+        index = self.program_indices.get(programs)
+        if index is None:
+            index = self.program_indices[programs] = len(self.program_sets)
+            self.program_sets.append(programs)
+        return index
+
+    def cell(self, bar, column):
+        # Return (EVENTS, NOTES, LOW, HIGH, POLYPHONY, PROGRAMS) for BAR and
+        # COLUMN, LOW and HIGH being None when there is no note.
+        index = bar * len(self.numbers) + column
+        low = self.lows[index]
+        if low < 0:
+            low = high = None
+        else:
+            high = self.highs[index]
+        return (self.events[index], self.notes[index], low, high,
+                self.polyphony[index],
+                self.program_sets[self.programs[index]])
+
+    def seek(self, decoder, bar):
+        # Move all tracks of DECODER to the start of BAR, as if decoded from
+        # the start, and return the first tick of BAR.  Channel settings
+        # are not replayed.
+        for column, track in enumerate(decoder.tracks):
+            index = bar * len(self.numbers) + column
+            if self.offsets[index] < 0:
+                track.position = track.limit
+                track.delta = None
+            else:
+                track.position = self.offsets[index]
+                track.delta = self.leads[index]
+                track.running_status = self.statuses[index]
+        return self.starts[bar]
+
+    def report(self, write, name=None):
+        # Write note counts in a bar by track grid, `.' for no event.
+        if name is not None:
+            write("%s: " % name)
+        write("%d bars, %d tracks" % (len(self.starts), len(self.numbers)))
+        factor = self.beats_per_bar()
+        if factor is None:
+            write(", bars vary, -b and -L cannot follow them\n")
+        else:
+            write(", same bars as -b %dx\n" % factor)
+        write("   bar  seconds " + ''.join(["%6s" % ("trk%d" % number)
+                                            for number in self.numbers])
+              + "\n")
+        tracks = len(self.numbers)
+        for bar in range(len(self.starts)):
+            cells = []
+            for column in range(tracks):
+                index = bar * tracks + column
+                if self.notes[index]:
+                    cells.append("%6d" % self.notes[index])
+                elif self.events[index]:
+                    cells.append("%6s" % "-")
+                else:
+                    cells.append("%6s" % ".")
+            write("%6d %8.3f %s\n" % (bar + 1, self.seconds[bar],
+                                      ''.join(cells)))
@@ -8,39 +8,87 @@ DUMP_NOTES = 1 << 1
 DUMP_EVENTS = 1 << 2                    # MIDI events except notes on/off
 DUMP_METAS = 1 << 3
 
-class run:
-    pass
-
-def reset():
-    # Program options.
-    run.freeze_channel = False
-    run.channel_zero = False
-    run.drum_channel = 9
-    run.speed_factor = 100
-    run.transpose = 0
-    run.extract = None
-    run.beats_per_bar = 1
-    run.start_bar = None                # included, counted from 0
-    run.end_bar = None                  # excluded, counted from 0
-    # Run-time variables.
-    run.mute = False
-    run.bar = None                      # bar number in file, counted from 0
-
-reset()
+class Run:
+    # Options and run-time state for a single decoding.  Each Decoder owns
+    # one, shared with its tracks and given to processors along with the
+    # header, so many files may be decoded or played at once.
+
+    def __init__(self):
+        # Program options.
+        self.freeze_channel = False
+        self.drum_channel = 9
+        self.speed_factor = 100
+        self.transpose = 0
+        self.channel_map = None         # output channel per input channel
+        self.velocity = 100             # velocity percentage
+        self.thin = None                # seconds between controller values
+        self.extract = None
+        self.beats_per_bar = 1
+        self.start_bar = None           # included, counted from 0
+        self.end_bar = None             # excluded, counted from 0
+        # Run-time variables.
+        self.mute = False
+        self.bar = None                 # bar number in file, counted from 0
 
 class Decoder:
 
-    def __init__(self, input):
-        buffer = input.read()
-        self.header = Header(buffer)
+    def __init__(self, input, run=None):
+        if run is None:
+            run = Run()
+        self.run = run
+        # Bytes are read once, then only indexed or viewed.
+        buffer = bytearray(input.read())
+        self.header = Header(buffer, run)
         position = self.header.limit
         self.tracks = []
         for counter in range(self.header.number_of_tracks):
-            track = Track(buffer, position, counter + 1)
+            track = Track(buffer, position, counter + 1, run)
             position = track.limit
             if run.extract is None or run.extract == track.number:
                 self.tracks.append(track)
         assert position == len(buffer), (position, len(buffer))
+        # Index of sounding notes, computed on first use.
+        self.index = None
+
+    def note_index(self):
+        # Return a NoteIndex for all notes of this file.
+        if self.index is None:
+            import intervals
+            self.index = intervals.NoteIndex(self)
+        return self.index
+
+    def event_array(self, jobs=None):
+        # Return all MIDI events as a NumPy structured array.  If JOBS is
+        # not None, tracks are decoded in parallel, see `arrays.py'.
+        import arrays
+        return arrays.event_array(self, jobs)
+
+    def note_array(self, jobs=None):
+        # Return all notes, with their durations, as a NumPy structured
+        # array.
+        import arrays
+        return arrays.note_array(arrays.event_array(self, jobs))
+
+    def timing(self):
+        # Return durations and counts, skimming tracks without dispatching
+        # any event.
+        import skim
+        return skim.Timing(self)
+
+    def events(self, tracks=None):
+        # Return a lazy Stream of events, see `events.py'.
+        import events
+        return events.events(self, tracks)
+
+    def matrix(self):
+        # Return a bar and track Matrix, see `matrix.py'.
+        import matrix
+        return matrix.Matrix(self)
+
+    def fingerprint(self, beats_per_bar=None):
+        # Return a Fingerprinter over all events, see `fingerprint.py'.
+        import fingerprint
+        return fingerprint.fingerprint(self, beats_per_bar)
 
     def serial_process(self, processor):
         processor.header(self.header)
@@ -48,9 +96,15 @@ class Decoder:
             track.rewind()
             while track.delta is not None:
                 processor.delay(track.delta)
-                track.dispatch_event(processor)
+                dispatch_event(track, processor)
 
     def parallel_process(self, processor):
+        run = self.run
+        run.mute = False
+        if run.start_bar is None:
+            index = None
+        else:
+            index = self.note_index()
         processor.header(self.header)
         for track in self.tracks:
             track.rewind()
@@ -58,49 +112,75 @@ class Decoder:
         run.beat = 0
         tics_per_bar = self.header.division * run.beats_per_bar
         tics = 0
-        while True:
-            delta = None
-            for track in self.tracks:
-                if track.delta is not None:
-                    if delta is None or track.delta < delta:
-                        delta = track.delta
-            if delta is None:
-                break
+        tick = 0
+        delta = None
+        for track in self.tracks:
+            if track.delta is not None:
+                if delta is None or track.delta < delta:
+                    delta = track.delta
+        while delta is not None:
             tics += delta
+            tick += delta
             bars, tics = divmod(tics, tics_per_bar)
             run.bar += bars
+            muted = run.mute
             run.mute = (
                 (run.start_bar is not None and run.bar < run.start_bar)
                 or (run.end_bar is not None and run.bar >= run.end_bar))
             processor.delay(delta)
-            for track in self.tracks:
-                if track.delta is not None:
-                    track.delta -= delta
-                    while track.delta == 0:
-                        track.dispatch_event(processor)
+            if muted and not run.mute:
+                self.restrike(processor, index, tick)
+            delta = dispatch_due(self.tracks, delta, processor)
+
+    def restrike(self, processor, index, tick):
+        # Sound again notes started before TICK and still held at TICK,
+        # as note ons are not dispatched while muted.
+        tracks = {}
+        for track in self.tracks:
+            tracks[track.number] = track
+        for start, end, number, channel, pitch, velocity in (
+                index.sounding(tick)):
+            if start < tick:
+                processor.note_on(tracks[number], channel, pitch, velocity)
+
+def dispatch_due(tracks, delta, processor):
+    # Advance all TRACKS by DELTA, dispatching events which become due,
+    # and return the smallest delta left, or None when all tracks ended.
+    minimum = None
+    for track in tracks:
+        if track.delta is not None:
+            track.delta -= delta
+            while track.delta == 0:
+                track.dispatch_event(processor)
+            if track.delta is not None:
+                if minimum is None or track.delta < minimum:
+                    minimum = track.delta
+    return minimum
 
 class Chunk:
 
-    def __init__(self, magic, buffer, position, number):
+    def __init__(self, magic, buffer, position, number, run):
         assert buffer[position:position+4] == magic, (
             buffer[position:position+4], magic)
-        self.buffer = buffer            # whole file buffer
+        self.buffer = buffer            # whole file buffer, a bytearray
+        self.view = memoryview(buffer)  # same, for slicing without copies
         self.start = position           # start index for MIDI chunk
         position += 4
         assert position+4 <= len(self.buffer), len(self.buffer)
         value = 0
         for counter in range(4):
-            value = (value << 8) | ord(self.buffer[position])
+            value = (value << 8) | self.buffer[position]
             position += 1
         self.position = position        # buffer index of next unparsed byte
         self.limit = position + value   # buffer index for end of this chunk
         assert self.limit <= len(buffer), (self.limit, len(buffer))
         self.number = number            # track number for printing
+        self.run = run                  # options and run-time state
 
 class Header(Chunk):
 
-    def __init__(self, buffer):
-        Chunk.__init__(self, 'MThd', buffer, 0, 0)
+    def __init__(self, buffer, run):
+        Chunk.__init__(self, 'MThd', buffer, 0, 0, run)
         self.midi_file_format = self.decode_intfix_2()
         assert 0 <= self.midi_file_format <= 2, self.midi_file_format
         self.number_of_tracks = self.decode_intfix_2()
@@ -110,15 +190,14 @@ class Header(Chunk):
     def decode_intfix_2(self):
         position = self.position
         assert position + 2 <= self.limit, (position, self.limit)
-        value = ((ord(self.buffer[position]) << 8)
-                 | ord(self.buffer[position+1]))
+        value = (self.buffer[position] << 8) | self.buffer[position+1]
         self.position = position + 2
         return value
 
 class Track(Chunk):
 
-    def __init__(self, buffer, position, track):
-        Chunk.__init__(self, 'MTrk', buffer, position, track)
+    def __init__(self, buffer, position, track, run):
+        Chunk.__init__(self, 'MTrk', buffer, position, track, run)
         self.running_status = None      # running status after last event
         self.delta = None               # delta time value before event
 
@@ -139,11 +218,8 @@ class Track(Chunk):
         # meta-event.  MIDI events cover voice messages only, as system
         # messages and real time messages do not occur in MIDI files.
         assert self.position < self.limit, (self.position, self.limit)
-        byte = ord(self.buffer[self.position])
+        byte = self.buffer[self.position]
         if byte & 0x80:
-            # Possibly alter running status.
-            if run.channel_zero and (byte & 0xf0) != 0xf0:
-                byte &= 0xf0
             event = byte
             self.position += 1
             if event < 0xf0:
@@ -158,21 +234,17 @@ class Track(Chunk):
             # MIDI event: note off.
             channel = self.running_status & 0x0f
             pitch = self.decode_int7()
-            if channel != run.drum_channel:
-                pitch += run.transpose
             velocity = self.decode_int7()
-            if pitch > 0:
-                processor.note_off(self, channel, pitch, velocity)
+            processor.note_off(self, channel, pitch, velocity)
             self.next_delta()
             return
         if nibble == 0x90:
             # MIDI event: note on.
             channel = self.running_status & 0x0f
             pitch = self.decode_int7()
-            if channel != run.drum_channel:
-                pitch += run.transpose
             velocity = self.decode_int7()
-            if pitch > 0:
+            # While muted, only let notes be turned off.
+            if not (self.run.mute and velocity):
                 processor.note_on(self, channel, pitch, velocity)
             self.next_delta()
             return
@@ -180,11 +252,8 @@ class Track(Chunk):
             # MIDI event: key pressure.
             channel = self.running_status & 0x0f
             pitch = self.decode_int7()
-            if channel != run.drum_channel:
-                pitch += run.transpose
             pressure = self.decode_int7()
-            if pitch > 0:
-                processor.key_pressure(self, channel, pitch, pressure)
+            processor.key_pressure(self, channel, pitch, pressure)
             self.next_delta()
             return
         if nibble == 0xb0:
@@ -199,8 +268,7 @@ class Track(Chunk):
             # MIDI event: program.
             channel = self.running_status & 0x0f
             program = self.decode_int7()
-            if not run.freeze_channel:
-                processor.program(self, channel, program)
+            processor.program(self, channel, program)
             self.next_delta()
             return
         if nibble == 0xd0:
@@ -313,10 +381,11 @@ class Track(Chunk):
             position = self.position
             counter = 1
             while position+counter < self.limit:
-                if ord(self.buffer[position+counter]) & 0x80:
+                if self.buffer[position+counter] & 0x80:
                     break
+                counter += 1
             processor.undefined(self, event,
-                                self.buffer[position:position+counter])
+                                self.view[position:position+counter])
             self.position = position + counter
             self.next_delta()
 
@@ -327,57 +396,65 @@ class Track(Chunk):
             self.delta = None
 
     def decode_int7(self):
-        assert self.position < self.limit, (self.position, self.limit)
-        assert ord(self.buffer[self.position]) & 0x80 == 0, (
-            self.position, ord(self.buffer[self.position]))
-        value = ord(self.buffer[self.position])
-        self.position += 1
+        position = self.position
+        assert position < self.limit, (position, self.limit)
+        value = self.buffer[position]
+        assert value & 0x80 == 0, (position, value)
+        self.position = position + 1
         return value
 
     def decode_int14(self):
-        assert self.position+2 <= self.limit, (self.position, self.limit)
-        assert ord(self.buffer[self.position]) & 0x80 == 0, (
-            self.position, ord(self.buffer[self.position]))
-        assert ord(self.buffer[self.position+1]) & 0x80 == 0, (
-            self.position+1, ord(self.buffer[self.position+1]))
-        value = ((ord(self.buffer[self.position]) << 7)
-                 | ord(self.buffer[self.position+1]))
-        self.position += 2
+        position = self.position
+        assert position+2 <= self.limit, (position, self.limit)
+        buffer = self.buffer
+        assert buffer[position] & 0x80 == 0, (position, buffer[position])
+        assert buffer[position+1] & 0x80 == 0, (
+            position+1, buffer[position+1])
+        # Least significant byte comes first.
+        value = buffer[position] | (buffer[position+1] << 7)
+        self.position = position + 2
         return value
 
     def decode_intfix(self, length):
         assert self.position+length <= self.limit, (self.position, self.limit)
         value = 0
         for counter in range(length):
-            value = (value << 8) | ord(self.buffer[self.position])
+            value = (value << 8) | self.buffer[self.position]
             self.position += 1
         return value
 
     def decode_intvar(self):
+        buffer = self.buffer
+        position = self.position
+        assert position < self.limit, (position, self.limit)
+        byte = buffer[position]
         value = 0
-        assert self.position < self.limit, (self.position, self.limit)
-        while ord(self.buffer[self.position]) & 0x80:
-            value = (value << 7) | (ord(self.buffer[self.position]) & 0x7f)
-            self.position += 1
-            assert self.position < self.limit, (self.position, self.limit)
-        value = (value << 7) | ord(self.buffer[self.position])
-        self.position += 1
-        return value
+        while byte & 0x80:
+            value = (value << 7) | (byte & 0x7f)
+            position += 1
+            assert position < self.limit, (position, self.limit)
+            byte = buffer[position]
+        self.position = position + 1
+        return (value << 7) | byte
 
     def decode_bytes(self, length):
+        # Return a memoryview over the next LENGTH bytes, without copying.
         position = self.position
         assert position+length <= self.limit, (self.position, self.limit)
-        bytes = [ord(self.buffer[position+counter])
-                 for counter in range(length)]
         self.position = position + length
-        return bytes
+        return self.view[position:position+length]
 
-    def decode_text(self, length):
-        position = self.position
-        assert position+length <= self.limit, (self.position, self.limit)
-        text = self.buffer[position:position+length]
-        self.position = position + length
-        return text
+    # Texts are bytes as well, only their use differs.
+    decode_text = decode_bytes
+
+# Dispatch through the compiled accelerator, if it has been built.
+try:
+    import accel
+except ImportError:
+    accel = None
+    dispatch_event = Track.dispatch_event.im_func
+else:
+    from accel import dispatch_event, dispatch_due
 
 class Processor:
     def header(self, header):
@@ -386,6 +463,10 @@ class Processor:
         pass
     def set_status(self, track, event):
         pass
+    def note_off(self, track, channel, pitch, velocity):
+        pass
+    def note_on(self, track, channel, pitch, velocity):
+        pass
     def key_pressure(self, track, channel, pitch, pressure):
         pass
     def parameter(self, track, channel, parameter, setting):
@@ -406,7 +487,10 @@ class Processor:
         pass
     def set_tempo(self, track, tempo):
         pass
-    def undefined(self, track, buffer):
+    def undefined(self, track, event, buffer):
+        pass
+    def silence(self):
+        # Turn off all sounding notes at once, rather than by note offs.
         pass
 
 class MultiProcessor:
@@ -447,6 +531,8 @@ class MultiProcessor:
         self.process('set_tempo', arguments)
     def undefined(self, *arguments):
         self.process('undefined', arguments)
+    def silence(self, *arguments):
+        self.process('silence', arguments)
     #
     def process(self, function_name, arguments):
         for processor in self.processors:
@@ -494,7 +580,8 @@ class Encoder(Processor):
             self.encode_byte(0xf7)
         else:
             self.encode_byte(0xf0)
-        self.encode_intvar(bytes)
+        self.encode_intvar(len(bytes))
+        self.encode_bytes(bytes)
 
     def meta_event_text(self, track, text, message):
         self.encode_byte(0xff)
@@ -505,7 +592,7 @@ class Encoder(Processor):
                           "Lyric": 0x05,
                           "Marker": 0x06,
                           "Cue": 0x07}.get(message))
-        self.encode_intvar(length)
+        self.encode_intvar(len(text))
         self.encode_text(text)
 
     def meta_event_binary(self, track, bytes, message):
@@ -514,7 +601,7 @@ class Encoder(Processor):
                           "Time Signature": 0x58,
                           "Key Signature": 0x59,
                           "Sequencer-Specific": 0x7f}.get(message))
-        self.encode_intvar(length)
+        self.encode_intvar(len(bytes))
         self.encode_bytes(bytes)
 
     def end_of_track(self, track):
@@ -528,7 +615,7 @@ class Encoder(Processor):
         self.encode_intvar(3)
         self.encode_intfix(3, tempo)
 
-    def undefined(self, track, buffer):
+    def undefined(self, track, event, buffer):
         pass
 
     def encode_byte(self, value):
@@ -541,8 +628,8 @@ class Encoder(Processor):
 
     def encode_int14(self, value):
         assert value < 1<<14, value
-        self.write(chr(value << 7))
         self.write(chr(value & 0x7f))
+        self.write(chr(value >> 7))
 
     def encode_intfix(self, length, value):
         assert value < 1<<(8*length), (value, length)
@@ -560,21 +647,41 @@ class Encoder(Processor):
         self.write(chr(value & 0x7f))
 
     def encode_bytes(self, bytes):
-        for byte in bytes:
-            self.write(chr(byte))
+        # BYTES is a memoryview, or any other buffer.
+        self.write(bytes)
 
     def encode_text(self, text):
         self.write(text)
 
+class WireEncoder(Encoder):
+    # Encode for a MIDI link rather than for a MIDI file.
+
+    def sysex(self, track, bytes, continuation=False):
+        # On the wire, sysex has no length, BYTES already ends with 0xf7.
+        if not continuation:
+            self.encode_byte(0xf0)
+        self.encode_bytes(bytes)
+
+    def encode_bytes(self, bytes):
+        self.write(bytes.tobytes())
+
 class Player(Processor):
 
-    def __init__(self):
+    def __init__(self, clock=None):
         # When ABSOLUTE is True, one second has DIVISION time units.
         # Otherwise, one quarter note has DIVISION time units.
         self.absolute = None
         self.division = None
         # Micro-seconds per quarter note.
         self.tempo = None
+        # Time at which the next event is due.
+        self.goal = None
+        # Options and run-time state, known from the header.
+        self.run = None
+        # Source of time, real unless a VirtualClock is given.
+        if clock is None:
+            from clock import wall_clock as clock
+        self.clock = clock
         # Opened flag.
         self.opened = True
 
@@ -585,24 +692,25 @@ class Player(Processor):
     def header(self, header):
         # Start at 120 quarter notes per minute, that is, 0.5 second per
         # quarter note, and this for when speed_factor is exactly 100.
+        self.run = header.run
         self.division = header.division
-        self.set_tempo(None, 5000 * run.speed_factor)
-        # Reset reference time when processing the MIDI file header.
-        import time
-        self.goal = time.time()
-        #if run.start_bar is None:
+        self.set_tempo(None, 500000)
+        # Set reference time when processing the first MIDI file header.
+        # Later files start exactly where the previous one ended.
+        if self.goal is None:
+            self.goal = self.clock.time()
+        #if self.run.start_bar is None:
 
     def delay(self, delta):
         # We should wait.  However, the real time moved as this program
         # burns CPU or has been context switched out by the operating
         # system, we might have to adjust the wait for such lags.
-        if run.mute:
+        if self.run.mute:
             return
         self.goal += delta * self.time_rate
-        import time
-        now = time.time()
-        if now < self.goal:
-            time.sleep(self.goal - now)
+        self.clock.wait(self.goal)
 
     def set_tempo(self, track, tempo):
-        self.time_rate = 1e-8 * tempo * run.speed_factor / self.division
+        self.tempo = tempo
+        self.time_rate = (1e-8 * tempo * self.run.speed_factor
+                          / self.division)
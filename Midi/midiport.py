@@ -4,48 +4,162 @@
 # François Pinard <pinard@iro.umontreal.ca>.
 
 import midi
+from pacer import Pacer
+from thinner import switches
+from voices import Voices
 
-class MidiPort(midi.Player, midi.Encoder):
-    def __init__(self, device=None):
+class MidiPort(midi.Player, midi.WireEncoder):
+
+    # Controllers never reordered nor coalesced by the pacer.
+    switches = frozenset(switches)
+
+    def __init__(self, device=None, rate=3125, clock=None, bulk=True):
         if device is None:
             device = '/dev/midi'
-        midi.Player.__init__(self)
+        midi.Player.__init__(self, clock)
         self.device = file(device, 'w')
-        midi.Encoder.__init__(self, self.write)
-        # Notes being sound, so we can silence them at close time.
-        self.notes = {}
+        # Bytes encoded for the current message.
+        self.fragments = []
+        midi.WireEncoder.__init__(self, self.fragments.append)
+        # Output is paced for a link of RATE bytes per second.  Without a
+        # RATE, messages are sent as soon as they are encoded.
+        if rate:
+            self.pacer = Pacer(self.send, rate)
+        else:
+            self.pacer = None
+        # Notes being sound, so we can silence them at once.  When BULK,
+        # this uses channel controllers, otherwise one note off per note.
+        self.voices = Voices()
+        self.bulk = bulk
 
     def close(self):
         if self.opened:
-            for channel, pitch in self.notes.keys():
-                self.note_off(None, channel, pitch, 127)
+            self.silence()
+            if self.pacer is not None:
+                clock = self.clock
+                self.pacer.flush(clock.time())
+                while self.pacer.pending():
+                    clock.wait(self.pacer.free)
+                    self.pacer.flush(clock.time())
+                if self.pacer.worst > .010:
+                    import sys
+                    self.pacer.report(sys.stderr.write)
             self.device.close()
             self.opened = False
 
-    def write(self, bytes):
+    def send(self, bytes):
         self.device.write(bytes)
         self.device.flush()
 
+    def silence(self):
+        if self.bulk:
+            self.voices.release(None, self.release_channel)
+        else:
+            self.voices.release(self.release_note)
+        if self.pacer is not None:
+            self.pacer.flush(self.clock.time())
+
+    def release_channel(self, channel, controller, value):
+        midi.WireEncoder.parameter(self, None, channel, controller, value)
+        if self.pacer is None:
+            self.send(self.message())
+        else:
+            self.pacer.note_off(self.message())
+
+    def release_note(self, channel, pitch):
+        midi.WireEncoder.note_off(self, None, channel, pitch, 0)
+        if self.pacer is None:
+            self.send(self.message())
+        else:
+            self.pacer.note_off(self.message())
+
+    def message(self):
+        # Return bytes encoded since the previous call.
+        message = ''.join(self.fragments)
+        del self.fragments[:]
+        return message
+
     def delay(self, delta):
-        #if not run.mute and self.running_status is not None:
-        #if self.running_status is not None:
-        #    self.device.flush()
-        midi.Player.delay(self, delta)
+        if self.pacer is None:
+            midi.Player.delay(self, delta)
+            return
+        # Send what the previous tick queued, then wait as Player does,
+        # letting held values and sysex chunks go as the wire frees.
+        clock = self.clock
+        self.pacer.flush(clock.time())
+        if self.run.mute:
+            return
+        self.goal += delta * self.time_rate
+        while self.pacer.pending() and self.pacer.free < self.goal:
+            clock.wait(self.pacer.free)
+            self.pacer.flush(clock.time())
+        clock.wait(self.goal)
 
     def note_off(self, track, channel, pitch, velocity):
-        midi.Encoder.note_off(self, track, channel, pitch, velocity)
-        key = channel, pitch
-        if key in self.notes:
-            del self.notes[key]
+        midi.WireEncoder.note_off(self, track, channel, pitch, velocity)
+        self.voices.note_off(channel, pitch)
+        if self.pacer is None:
+            self.send(self.message())
+        else:
+            self.pacer.note_off(self.message())
 
     def note_on(self, track, channel, pitch, velocity):
-        midi.Encoder.note_on(self, track, channel, pitch, velocity)
-        key = channel, pitch
+        midi.WireEncoder.note_on(self, track, channel, pitch, velocity)
         if velocity == 0:
-            if key in self.notes:
-                del self.notes[key]
+            self.voices.note_off(channel, pitch)
+        else:
+            self.voices.note_on(channel, pitch)
+        if self.pacer is None:
+            self.send(self.message())
+        elif velocity == 0:
+            self.pacer.note_off(self.message())
+        else:
+            self.pacer.note_on(self.message())
+
+    def key_pressure(self, track, channel, pitch, pressure):
+        midi.WireEncoder.key_pressure(self, track, channel, pitch, pressure)
+        self.control(None)
+
+    def parameter(self, track, channel, parameter, setting):
+        midi.WireEncoder.parameter(self, track, channel, parameter, setting)
+        if parameter in self.switches:
+            self.setting()
+        else:
+            self.control((0xb0 | channel, parameter))
+
+    def program(self, track, channel, program):
+        midi.WireEncoder.program(self, track, channel, program)
+        self.setting()
+
+    def channel_pressure(self, track, channel, pressure):
+        midi.WireEncoder.channel_pressure(self, track, channel, pressure)
+        self.control(None)
+
+    def pitch_wheel(self, track, channel, wheel):
+        midi.WireEncoder.pitch_wheel(self, track, channel, wheel)
+        self.control((0xe0 | channel, None))
+
+    def sysex(self, track, bytes, continuation=False):
+        midi.WireEncoder.sysex(self, track, bytes, continuation)
+        if self.pacer is None:
+            self.send(self.message())
+        else:
+            self.pacer.sysex(self.message())
+
+    def setting(self):
+        # Send the message just encoded, in order with other settings.
+        if self.pacer is None:
+            self.send(self.message())
+        else:
+            self.pacer.setting(self.message())
+
+    def control(self, key):
+        # Send the message just encoded, which may be superseded by a later
+        # one having the same KEY, if not None, while the wire is behind.
+        if self.pacer is None:
+            self.send(self.message())
         else:
-            self.notes[key] = None
+            self.pacer.control(key, self.message())
 
     # Do not encode the following events, despite an encoding exists.
 
@@ -57,5 +171,5 @@ class MidiPort(midi.Player, midi.Encoder):
         pass
     def end_of_track(self, track):
         pass
-    def undefined(self, track, buffer):
+    def undefined(self, track, event, buffer):
         pass
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Output pacing for serial MIDI links.
+
+A DIN MIDI link carries about 3125 bytes per second.  The Pacer models
+when the wire gets free again, and orders what is due at each tick: note
+offs, then settings, then note ons, then other channel messages.  Settings
+are program changes and controllers whose every value matters, like bank
+selects, data entries and parameter numbers; they keep their arrival
+order, so a bank select still precedes its program change.  When the wire
+is behind, other controller, pressure and pitch wheel values wait, and a
+newer controller or pitch wheel value for the same channel and controller
+replaces an older one not sent yet.  Large sysex messages go in chunks as
+the wire frees.
+"""
+
+class Pacer:
+
+    # Delay, in seconds, under which the wire is not considered behind.
+    slack = .002
+    # Number of sysex bytes written at once.
+    chunk_size = 32
+
+    def __init__(self, write, rate=3125):
+        self.write = write
+        self.rate = float(rate)
+        # Time at which the wire will have sent everything written.
+        self.free = 0.
+        # Messages due at this tick, by priority.
+        self.offs = []
+        self.settings = []
+        self.ons = []
+        # Other channel messages, as (KEY, MESSAGE) in arrival order.  While
+        # the wire is behind, a newer message replaces an older one having
+        # the same KEY, unless KEY is None.
+        self.controls = []
+        # Sysex chunks not sent yet, and whether one sysex is started.
+        self.chunks = []
+        self.in_sysex = False
+        # Statistics.
+        self.lag = 0.
+        self.worst = 0.
+        self.coalesced = 0
+
+    def note_off(self, message):
+        self.offs.append(message)
+
+    def setting(self, message):
+        self.settings.append(message)
+
+    def note_on(self, message):
+        self.ons.append(message)
+
+    def control(self, key, message):
+        self.controls.append((key, message))
+
+    def sysex(self, message):
+        # The last chunk of each message is marked, so we know when other
+        # messages may go again.
+        for start in range(0, len(message), self.chunk_size):
+            chunk = message[start:start+self.chunk_size]
+            self.chunks.append((chunk, start + self.chunk_size
+                                >= len(message)))
+
+    def pending(self):
+        return bool(self.controls or self.chunks)
+
+    def send(self, data, now):
+        if data:
+            self.write(data)
+            self.free = max(self.free, now) + len(data) / self.rate
+
+    def flush(self, now):
+        # Send what is due at time NOW, as far as the wire allows.
+        # A started sysex must end before anything else.
+        while self.in_sysex and self.chunks:
+            chunk, last = self.chunks.pop(0)
+            self.send(chunk, now)
+            self.in_sysex = not last
+        self.send(''.join(self.offs + self.settings + self.ons), now)
+        self.offs = []
+        self.settings = []
+        self.ons = []
+        if self.controls:
+            if self.free - now <= self.slack:
+                self.send(''.join([message for key, message
+                                   in self.controls]), now)
+                self.controls = []
+            else:
+                self.coalesce()
+        while self.chunks and self.free - now <= self.slack:
+            chunk, last = self.chunks.pop(0)
+            self.send(chunk, now)
+            self.in_sysex = not last
+        self.lag = max(self.free - now, 0.)
+        self.worst = max(self.worst, self.lag)
+
+    def coalesce(self):
+        # Keep the newest message for each key, where its oldest one stood.
+        kept = []
+        where = {}
+        for key, message in self.controls:
+            if key is not None and key in where:
+                kept[where[key]] = key, message
+                self.coalesced += 1
+            else:
+                if key is not None:
+                    where[key] = len(kept)
+                kept.append((key, message))
+        self.controls = kept
+
+    def report(self, write):
+        write("MIDI wire was up to %.1f ms behind, %d values coalesced\n"
+              % (1e3 * self.worst, self.coalesced))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Gapless playlists.
+
+Files are decoded ahead on a background thread while the current one
+plays.  All files go through the same processor, so the output port stays
+open, and players continue their time goal from the exact end of the
+previous file.  Between files, controllers get reset only on channels
+which changed them.
+"""
+
+import midi
+
+def read_playlist(name):
+    # Return file names listed in playlist NAME, one per line.  Empty
+    # lines and lines starting with `#' are ignored, and relative names
+    # are taken from the directory holding the playlist.
+    import os
+    directory = os.path.dirname(name)
+    names = []
+    for line in file(name):
+        line = line.strip()
+        if line and not line.startswith('#'):
+            names.append(os.path.join(directory, line))
+    return names
+
+# Suffixes of MIDI file names, when searching directories.
+suffixes = '.mid', '.midi', '.kar'
+
+def find_files(arguments):
+    # Generate names of MIDI files given in ARGUMENTS, walking directories
+    # recursively.  Files suffixed with `.gz' are retained as well.
+    import os
+    for argument in arguments:
+        if not os.path.isdir(argument):
+            yield argument
+            continue
+        for directory, subdirectories, names in os.walk(argument):
+            subdirectories.sort()
+            names.sort()
+            for name in names:
+                base = name.lower()
+                if base.endswith('.gz'):
+                    base = base[:-3]
+                if base.endswith(suffixes):
+                    yield os.path.join(directory, name)
+
+class Prefetcher:
+    # Iterate over (NAME, DECODER) for all NAMES, decoding up to AHEAD
+    # files in advance with DECODE(NAME, RUN).  Each file gets its own copy
+    # of RUN.  When a file cannot be decoded, DECODER is the exception.
+
+    def __init__(self, names, decode, run, ahead=2):
+        import threading, Queue
+        self.queue = Queue.Queue(ahead)
+        thread = threading.Thread(target=self.work,
+                                  args=(names, decode, run))
+        thread.setDaemon(True)
+        thread.start()
+
+    def work(self, names, decode, run):
+        # Any failure is queued for its file, and the end is always marked,
+        # lest the player waits for ever.
+        import copy
+        try:
+            for name in names:
+                try:
+                    decoder = decode(name, copy.copy(run))
+                    if run.start_bar is not None:
+                        decoder.note_index()
+                except Exception, exception:
+                    decoder = exception
+                self.queue.put((name, decoder))
+        finally:
+            self.queue.put((None, None))
+
+    def __iter__(self):
+        while True:
+            name, decoder = self.queue.get()
+            if name is None:
+                return
+            yield name, decoder
+
+class Watcher(midi.Processor):
+    # Forward everything to PROCESSOR, noting which channels got their
+    # controllers changed, so they may be reset before the next file.
+    # CHANGED gives, for each channel, the track which last changed it, or
+    # None, and the reset is sent as coming from that track.
+
+    def __init__(self, processor):
+        self.processor = processor
+        self.changed = [None] * 16
+        for name in ('header', 'delay', 'set_status', 'note_off', 'note_on',
+                     'key_pressure', 'program', 'sysex', 'meta_event_text',
+                     'meta_event_binary', 'end_of_track', 'set_tempo',
+                     'undefined', 'silence'):
+            setattr(self, name, getattr(processor, name))
+
+    def parameter(self, track, channel, parameter, setting):
+        self.changed[channel] = track
+        self.processor.parameter(track, channel, parameter, setting)
+
+    def channel_pressure(self, track, channel, pressure):
+        self.changed[channel] = track
+        self.processor.channel_pressure(track, channel, pressure)
+
+    def pitch_wheel(self, track, channel, wheel):
+        self.changed[channel] = track
+        self.processor.pitch_wheel(track, channel, wheel)
+
+    def reset_controllers(self):
+        for channel in range(16):
+            track = self.changed[channel]
+            if track is not None:
+                # Reset All Controllers.
+                self.processor.parameter(track, channel, 121, 0)
+                self.changed[channel] = None
+
+def play(decoders, processor, serial=False):
+    # Process all DECODERS, as given by a Prefetcher, through PROCESSOR.
+    # Files are performed one after another, unless SERIAL.
+    import sys
+    watcher = Watcher(processor)
+    for name, decoder in decoders:
+        if isinstance(decoder, Exception):
+            sys.stderr.write("%s: %s\n" % (name, decoder))
+            continue
+        if serial:
+            decoder.serial_process(watcher)
+        else:
+            watcher.reset_controllers()
+            decoder.parallel_process(watcher)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+import midi
+from console import frequencies
+
+class Renderer(midi.Player):
+    # Render the performance into a WAV file, as fast as the machine goes.
+    # Like the console player, this is meant for checking scores without a
+    # sound card, but it works offline and needs NumPy.  Each note is a
+    # sine oscillator with a linear attack and release, scaled by velocity.
+
+    # Number of samples computed at once, this bounds memory usage.
+    block_size = 4096
+    # Attack and release durations, in seconds.
+    attack = .010
+    release = .080
+    # Amplitude of a single voice at full velocity.
+    gain = .15
+
+    def __init__(self, output, rate=44100):
+        midi.Player.__init__(self)
+        import numpy, wave
+        self.numpy = numpy
+        self.rate = rate
+        self.wave = wave.open(output, 'wb')
+        self.wave.setnchannels(1)
+        self.wave.setsampwidth(2)
+        self.wave.setframerate(rate)
+        # Number of samples already written.
+        self.rendered = 0
+        # Sounding voices are kept in parallel arrays, one entry per voice.
+        # KEYS holds (channel, pitch), OMEGAS are phase increments per
+        # sample, PHASES are current phases, AMPLITUDES are peak levels,
+        # AGES count samples since note on, and RELEASES give the age at
+        # note off, or -1 while the note is held.
+        self.keys = []
+        self.omegas = numpy.zeros(0)
+        self.phases = numpy.zeros(0)
+        self.amplitudes = numpy.zeros(0)
+        self.ages = numpy.zeros(0, int)
+        self.releases = numpy.zeros(0, int)
+
+    def close(self):
+        if self.opened:
+            # Let release tails ring until they vanish.
+            if self.keys:
+                self.render(self.rendered + int(self.release * self.rate) + 1)
+            self.wave.close()
+            self.opened = False
+
+    def header(self, header):
+        if self.goal is None:
+            self.goal = 0.
+        midi.Player.header(self, header)
+
+    def delay(self, delta):
+        # Only move the goal, as the actual rendering is delayed until the
+        # set of voices changes.  This keeps NumPy calls few and big.
+        if self.run.mute:
+            return
+        self.goal += delta * self.time_rate
+
+    def note_off(self, track, channel, pitch, velocity):
+        key = channel, pitch
+        if key not in self.keys:
+            return
+        self.render(int(self.goal * self.rate))
+        index = self.keys.index(key)
+        if self.releases[index] < 0:
+            self.releases[index] = self.ages[index]
+
+    def note_on(self, track, channel, pitch, velocity):
+        if velocity == 0:
+            self.note_off(track, channel, pitch, 0)
+            return
+        if self.run.mute or channel == self.run.drum_channel:
+            return
+        if not 0 <= pitch < 128:
+            return
+        self.render(int(self.goal * self.rate))
+        numpy = self.numpy
+        key = channel, pitch
+        if key in self.keys:
+            # Restrike a held note: release the old voice first.
+            index = self.keys.index(key)
+            self.keys[index] = None
+            if self.releases[index] < 0:
+                self.releases[index] = self.ages[index]
+        self.keys.append(key)
+        omega = 2 * numpy.pi * frequencies[pitch] / self.rate
+        self.omegas = numpy.append(self.omegas, omega)
+        self.phases = numpy.append(self.phases, 0.)
+        self.amplitudes = numpy.append(self.amplitudes,
+                                       self.gain * velocity / 127.)
+        self.ages = numpy.append(self.ages, 0)
+        self.releases = numpy.append(self.releases, -1)
+
+    def render(self, limit):
+        # Write samples until LIMIT samples have been written overall.
+        numpy = self.numpy
+        attack = max(int(self.attack * self.rate), 1)
+        release = max(int(self.release * self.rate), 1)
+        while self.rendered < limit:
+            count = min(limit - self.rendered, self.block_size)
+            if not self.keys:
+                self.wave.writeframes('\0\0' * count)
+                self.rendered += count
+                continue
+            steps = numpy.arange(count, dtype=numpy.float32)
+            ages = self.ages.astype(numpy.float32)[:, None] + steps
+            envelopes = numpy.minimum(ages / float(attack), 1.)
+            released = self.releases >= 0
+            if released.any():
+                fading = ((ages - self.releases[:, None]) / float(release))
+                fading = numpy.clip(1. - fading, 0., 1.)
+                envelopes = numpy.where(released[:, None],
+                                        envelopes * fading, envelopes)
+            signal = self.omegas.astype(numpy.float32)[:, None] * steps
+            signal += self.phases.astype(numpy.float32)[:, None]
+            numpy.sin(signal, signal)
+            signal *= envelopes * self.amplitudes[:, None]
+            samples = numpy.clip(signal.sum(axis=0), -1., 1.)
+            self.wave.writeframes(
+                (samples * 32767).astype('<i2').tostring())
+            self.rendered += count
+            self.phases = (self.phases + self.omegas * count) % (2 * numpy.pi)
+            self.ages += count
+            # Forget voices which faded out completely.
+            alive = ~released | (self.ages - self.releases < release)
+            if not alive.all():
+                self.keys = [key for key, keep in zip(self.keys, alive)
+                             if keep]
+                self.omegas = self.omegas[alive]
+                self.phases = self.phases[alive]
+                self.amplitudes = self.amplitudes[alive]
+                self.ages = self.ages[alive]
+                self.releases = self.releases[alive]
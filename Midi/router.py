@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Live MIDI thru router.
+
+A Router waits on many raw MIDI inputs at once, parses whatever bytes
+arrive into processor calls, usually through a Transform, and has them
+encoded by a BatchWriter which sends everything ready to all outputs in
+a single write each.  The delay between reading an input and writing the
+outputs is measured for every message.
+"""
+
+import os, time
+import midi
+
+class Source:
+    # A raw MIDI input, parsed incrementally.  NUMBER stands for a track
+    # number in processor calls.
+
+    def __init__(self, fd, number):
+        self.fd = fd
+        self.number = number
+        self.running_status = None
+        self.pending = []               # data bytes of incomplete message
+        self.sysex = None               # bytes of incomplete sysex
+
+    def feed(self, data, processor):
+        # Parse DATA into calls to PROCESSOR, return the number of calls.
+        count = 0
+        for byte in bytearray(data):
+            if byte >= 0xf8:
+                # Real time messages, like clock and active sensing, may
+                # appear anywhere and are ignored.
+                continue
+            if byte & 0x80:
+                if self.sysex is not None:
+                    # Any status ends a sysex, normally 0xf7.
+                    self.sysex.append(0xf7)
+                    processor.sysex(self, memoryview(self.sysex), False)
+                    self.sysex = None
+                    count += 1
+                    if byte == 0xf7:
+                        continue
+                if byte == 0xf0:
+                    self.sysex = bytearray()
+                    self.running_status = None
+                elif byte < 0xf0:
+                    self.running_status = byte
+                else:
+                    # Other system common messages are dropped.
+                    self.running_status = None
+                self.pending = []
+                continue
+            if self.sysex is not None:
+                self.sysex.append(byte)
+                continue
+            status = self.running_status
+            if status is None:
+                continue
+            self.pending.append(byte)
+            nibble = status & 0xf0
+            if nibble == 0xc0 or nibble == 0xd0:
+                needed = 1
+            else:
+                needed = 2
+            if len(self.pending) < needed:
+                continue
+            pending = self.pending
+            self.pending = []
+            channel = status & 0x0f
+            if nibble == 0x80:
+                processor.note_off(self, channel, pending[0], pending[1])
+            elif nibble == 0x90:
+                processor.note_on(self, channel, pending[0], pending[1])
+            elif nibble == 0xa0:
+                processor.key_pressure(self, channel, pending[0],
+                                       pending[1])
+            elif nibble == 0xb0:
+                processor.parameter(self, channel, pending[0], pending[1])
+            elif nibble == 0xc0:
+                processor.program(self, channel, pending[0])
+            elif nibble == 0xd0:
+                processor.channel_pressure(self, channel, pending[0])
+            else:
+                # Pitch wheel data comes least significant byte first.
+                processor.pitch_wheel(self, channel,
+                                      ((pending[1] << 7) | pending[0])
+                                      - 0x2000)
+            count += 1
+        return count
+
+class BatchWriter(midi.WireEncoder):
+    # Encode events into memory, until flush() sends them to all FDS.
+
+    def __init__(self, fds):
+        self.fds = fds
+        self.fragments = []
+        midi.WireEncoder.__init__(self, self.fragments.append)
+
+    def flush(self):
+        if self.fragments:
+            data = ''.join(self.fragments)
+            del self.fragments[:]
+            for fd in self.fds:
+                while data:
+                    written = os.write(fd, data)
+                    data = data[written:]
+
+class Latency:
+    # Distribution of latencies, in buckets of RESOLUTION seconds, up to
+    # LIMIT seconds, so memory stays constant however long we run.
+
+    def __init__(self, resolution=10e-6, limit=.1):
+        self.resolution = resolution
+        self.counts = [0] * (int(limit / resolution) + 1)
+        self.count = 0
+        self.total = 0.
+        self.maximum = 0.
+
+    def add(self, latency, count=1):
+        index = min(int(latency / self.resolution), len(self.counts) - 1)
+        self.counts[index] += count
+        self.count += count
+        self.total += latency * count
+        self.maximum = max(self.maximum, latency)
+
+    def percentile(self, fraction):
+        # Return the latency, rounded up to a bucket, under which FRACTION
+        # of all messages went.
+        goal = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= goal:
+                return (index + 1) * self.resolution
+        return self.maximum
+
+    def report(self, write):
+        if not self.count:
+            write("No message routed.\n")
+            return
+        write("%d messages, latency mean %.1f us, max %.1f us\n"
+              % (self.count, 1e6 * self.total / self.count,
+                 1e6 * self.maximum))
+        for fraction in .5, .9, .99, .999:
+            write("  %5.1f%% under %.0f us\n"
+                  % (100 * fraction, 1e6 * self.percentile(fraction)))
+
+class Router:
+    # Route all messages from inputs to PROCESSOR, then call FLUSH, if
+    # any, once per wake up.  FLUSH may return a number of seconds after
+    # which it wants to be called again, even without input.
+
+    def __init__(self, processor, flush=None):
+        import select
+        self.processor = processor
+        self.flush = flush
+        self.sources = {}
+        self.poll = select.poll()
+        self.latency = Latency()
+
+    def add_input(self, name):
+        # Add NAME, a device name or an opened file descriptor, as input.
+        if isinstance(name, int):
+            fd = name
+        else:
+            fd = os.open(name, os.O_RDONLY | os.O_NONBLOCK)
+        self.sources[fd] = Source(fd, len(self.sources) + 1)
+        import select
+        self.poll.register(fd, select.POLLIN)
+
+    def run(self, timeout=None):
+        # Route until all inputs are closed, or TIMEOUT seconds without
+        # any input.
+        import select
+        if timeout is not None:
+            timeout = int(1000 * timeout)
+        processor = self.processor
+        hold = None
+        while self.sources:
+            wait = timeout
+            if hold is not None:
+                wait = int(1000 * hold) + 1
+                if timeout is not None:
+                    wait = min(wait, timeout)
+            ready = self.poll.poll(wait)
+            if not ready:
+                if hold is None:
+                    return
+                hold = self.flush()
+                continue
+            arrival = time.time()
+            count = 0
+            for fd, flags in ready:
+                data = ''
+                if flags & select.POLLIN:
+                    try:
+                        data = os.read(fd, 4096)
+                    except OSError:
+                        pass
+                if data:
+                    count += self.sources[fd].feed(data, processor)
+                else:
+                    self.poll.unregister(fd)
+                    del self.sources[fd]
+            if self.flush is not None:
+                hold = self.flush()
+            if count:
+                self.latency.add(time.time() - arrival, count)
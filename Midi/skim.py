@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Fast timing reports.
+
+Skimming walks each track over delta times and event lengths only, with no
+processor call.  Nothing is decoded besides tempo changes and time
+signatures, which is enough to get track durations in ticks and seconds,
+event counts and the number of bars, for a whole library at once.
+"""
+
+import midi
+
+# Default tempo, in micro-seconds per quarter note.
+DEFAULT_TEMPO = 500000
+
+# Data bytes following each channel event status, by status nibble.
+data_lengths = [None] * 8 + [2, 2, 2, 2, 1, 1, 2, None]
+
+def skim_track(track):
+    # Return (TICKS, EVENTS, TEMPOS, SIGNATURES) for TRACK, where TEMPOS
+    # lists (TICK, TEMPO) and SIGNATURES lists (TICK, NUMERATOR, POWER),
+    # the denominator being 2 to the POWER.
+    buffer = track.buffer
+    position = track.start + 8
+    limit = track.limit
+    lengths = data_lengths
+    tick = 0
+    events = 0
+    running = 0
+    tempos = []
+    signatures = []
+    while position < limit:
+        byte = buffer[position]
+        position += 1
+        delta = byte & 0x7f
+        while byte & 0x80:
+            byte = buffer[position]
+            position += 1
+            delta = (delta << 7) | (byte & 0x7f)
+        tick += delta
+        event = buffer[position]
+        if event & 0x80:
+            position += 1
+            if event < 0xf0:
+                running = event
+        else:
+            event = running
+        events += 1
+        if 0x80 <= event < 0xf0:
+            position += lengths[event >> 4]
+        elif event == 0xff or event == 0xf0 or event == 0xf7:
+            if event == 0xff:
+                kind = buffer[position]
+                position += 1
+            else:
+                kind = None
+            byte = buffer[position]
+            position += 1
+            length = byte & 0x7f
+            while byte & 0x80:
+                byte = buffer[position]
+                position += 1
+                length = (length << 7) | (byte & 0x7f)
+            if kind == 0x51 and length == 3:
+                tempos.append((tick, (buffer[position] << 16)
+                               | (buffer[position+1] << 8)
+                               | buffer[position+2]))
+            elif kind == 0x58 and length >= 2:
+                signatures.append((tick, buffer[position],
+                                   buffer[position+1]))
+            position += length
+        else:
+            # Undefined, skip data bytes.
+            while position < limit and not buffer[position] & 0x80:
+                position += 1
+    assert position == limit, (position, limit)
+    return tick, events, tempos, signatures
+
+if midi.accel is not None:
+    skim_track = midi.accel.skim_track
+
+class Timing:
+    # Durations and counts for a whole file, and for each of its TRACKS,
+    # given as (NUMBER, TICKS, SECONDS, EVENTS).  BARS is None for files
+    # timed in SMPTE frames.
+
+    def __init__(self, decoder):
+        header = decoder.header
+        self.midi_file_format = header.midi_file_format
+        self.division = header.division
+        skims = [skim_track(track) for track in decoder.tracks]
+        tempos = []
+        signatures = []
+        for ticks, events, track_tempos, track_signatures in skims:
+            tempos += track_tempos
+            signatures += track_signatures
+        self.tracks = []
+        for track, (ticks, events, track_tempos, track_signatures) in zip(
+                decoder.tracks, skims):
+            # In format 2, each track is an independent sequence.
+            if self.midi_file_format == 2:
+                seconds = self.seconds_at(ticks, track_tempos)
+            else:
+                seconds = self.seconds_at(ticks, tempos)
+            self.tracks.append((track.number, ticks, seconds, events))
+        self.ticks = max([0] + [entry[1] for entry in self.tracks])
+        self.seconds = max([0.] + [entry[2] for entry in self.tracks])
+        self.events = sum([entry[3] for entry in self.tracks])
+        self.bars = self.count_bars(self.ticks, signatures)
+
+    def seconds_at(self, ticks, tempos):
+        # Return seconds elapsed at TICKS, following TEMPOS changes.
+        division = self.division
+        if division & 0x8000:
+            # SMPTE frames per second, and ticks per frame.
+            return ticks / float((256 - (division >> 8))
+                                 * (division & 0xff))
+        tempos = sorted(tempos)
+        seconds = 0.
+        start = 0
+        tempo = DEFAULT_TEMPO
+        for tick, new_tempo in tempos:
+            if tick >= ticks:
+                break
+            seconds += (tick - start) * tempo
+            start = tick
+            tempo = new_tempo
+        seconds += (ticks - start) * tempo
+        return 1e-6 * seconds / division
+
+    def count_bars(self, ticks, signatures):
+        # Return the number of bars, started or complete, in TICKS.  A time
+        # signature change always starts a new bar.
+        division = self.division
+        if division & 0x8000:
+            return None
+        signatures = sorted(signatures)
+        bars = 0
+        start = 0
+        per_bar = 4 * division
+        for tick, numerator, power in signatures:
+            if tick >= ticks:
+                break
+            bars += -(-(tick - start) // per_bar)
+            start = tick
+            per_bar = max(1, 4 * division * numerator >> power)
+        bars += -(-(ticks - start) // per_bar)
+        return bars
+
+    def report(self, write, name=None):
+        if name is not None:
+            write("%s: " % name)
+        write("format %d, %d tracks, division %d\n"
+              % (self.midi_file_format, len(self.tracks), self.division))
+        for number, ticks, seconds, events in self.tracks:
+            write("  trk%-3d %9d ticks %10.3f s %7d events\n"
+                  % (number, ticks, seconds, events))
+        if self.bars is None:
+            bars = ''
+        else:
+            bars = ", %d bars" % self.bars
+        write("  total  %9d ticks %10.3f s %7d events%s\n"
+              % (self.ticks, self.seconds, self.events, bars))
@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Controller and pitch wheel thinning.
+
+A Thinner stands before a processor and drops controller, channel pressure
+and pitch wheel values which repeat the current one, or come too soon or
+change too little after the last one sent.  A dropped value is held, and
+sent once the interval has passed if nothing newer replaced it, so the
+final value of a ramp always gets through.  Switches, bank selects and
+parameter number controllers are never thinned.
+"""
+
+import math
+import midi
+
+# Controllers whose every value matters.
+switches = [0, 6, 32, 38] + range(64, 70) + [84] + range(96, 102) + range(
+    120, 128)
+
+# Entries per channel in state tables: one per controller, then one for
+# the pitch wheel and one for channel pressure.
+PITCH_WHEEL = 128
+CHANNEL_PRESSURE = 129
+ENTRIES = 130
+
+class Thinner(midi.Processor):
+    # Send at most one value per INTERVAL seconds for each channel and
+    # controller, and only if it differs by STEP or more from the last value
+    # sent, WHEEL_STEP for the pitch wheel.  Time is read from CLOCK if
+    # given, for live input, otherwise it follows delays and tempo.
+
+    def __init__(self, processor, interval=.010, step=1, wheel_step=16,
+                 clock=None):
+        self.processor = processor
+        self.interval = interval
+        self.clock = clock
+        self.steps = [step] * ENTRIES
+        self.steps[PITCH_WHEEL] = wheel_step
+        self.thinned = [True] * ENTRIES
+        for controller in switches:
+            self.thinned[controller] = False
+        # Callbacks needing no change go straight to the processor.
+        for name in ('set_status', 'note_off', 'key_pressure', 'program',
+                     'sysex', 'meta_event_text', 'meta_event_binary',
+                     'undefined', 'silence'):
+            setattr(self, name, getattr(processor, name))
+        self.reset()
+        # Seconds per tick, known from the header and tempo changes.
+        self.division = None
+        self.rate = 0.
+        # Statistics.
+        self.kept = 0
+        self.dropped = 0
+
+    def reset(self):
+        # State tables, indexed by CHANNEL * ENTRIES + ENTRY.  SENT is the
+        # last value sent, SENT_TIME when it was.  HELD is a value not sent
+        # yet, from HELD_TRACK, which goes at DUE time.  PENDING lists the
+        # indices having a held value, in arrival order.
+        size = 16 * ENTRIES
+        self.sent = [None] * size
+        self.sent_time = [None] * size
+        self.held = [None] * size
+        self.held_track = [None] * size
+        self.due = [None] * size
+        self.pending = []
+        self.time = 0.
+
+    def now(self):
+        if self.clock is None:
+            return self.time
+        return self.clock()
+
+    def header(self, header):
+        # Each file starts with fresh state, at 120 quarter notes per minute.
+        self.reset()
+        self.division = header.division
+        self.rate = .5 / self.division
+        self.processor.header(header)
+
+    def set_tempo(self, track, tempo):
+        self.rate = 1e-6 * tempo / self.division
+        self.processor.set_tempo(track, tempo)
+
+    def delay(self, delta):
+        if self.clock is None:
+            # Cut DELTA so held values go when due.
+            while self.pending and self.rate:
+                due = min([self.due[index] for index in self.pending])
+                ticks = int(math.ceil((due - self.time) / self.rate))
+                if ticks > delta:
+                    break
+                if ticks > 0:
+                    self.processor.delay(ticks)
+                    self.time += ticks * self.rate
+                    delta -= ticks
+                self.flush()
+            self.time += delta * self.rate
+        self.processor.delay(delta)
+
+    def flush(self, channel=None):
+        # Send held values which are due, or all those of CHANNEL if given.
+        # Return seconds until the next held value is due, or None.
+        now = self.now()
+        pending = []
+        for index in self.pending:
+            if (self.due[index] <= now + 1e-6
+                    or (channel is not None
+                        and index // ENTRIES == channel)):
+                self.send(self.held_track[index], index, self.held[index],
+                          now)
+            else:
+                pending.append(index)
+        self.pending = pending
+        if pending:
+            return max(0., min([self.due[index] for index in pending]) - now)
+
+    def send(self, track, index, value, now):
+        self.sent[index] = value
+        self.sent_time[index] = now
+        self.held[index] = None
+        self.held_track[index] = None
+        self.kept += 1
+        channel, entry = divmod(index, ENTRIES)
+        if entry == PITCH_WHEEL:
+            self.processor.pitch_wheel(track, channel, value)
+        elif entry == CHANNEL_PRESSURE:
+            self.processor.channel_pressure(track, channel, value)
+        else:
+            self.processor.parameter(track, channel, entry, value)
+
+    def thin(self, track, channel, entry, value):
+        index = channel * ENTRIES + entry
+        now = self.now()
+        sent = self.sent[index]
+        if self.held[index] is not None:
+            # The value held so far is replaced.
+            self.held[index] = None
+            self.pending.remove(index)
+            self.dropped += 1
+        if value == sent:
+            self.dropped += 1
+            return
+        if sent is None or (now - self.sent_time[index] >= self.interval
+                            and abs(value - sent) >= self.steps[entry]):
+            self.send(track, index, value, now)
+            return
+        self.held[index] = value
+        self.held_track[index] = track
+        self.pending.append(index)
+        # Wait out the interval, or one more interval for a small change.
+        if now - self.sent_time[index] < self.interval:
+            self.due[index] = self.sent_time[index] + self.interval
+        else:
+            self.due[index] = now + self.interval
+
+    def note_on(self, track, channel, pitch, velocity):
+        # A note starts with all values of its channel.
+        if self.pending:
+            self.flush(channel)
+        self.processor.note_on(track, channel, pitch, velocity)
+
+    def parameter(self, track, channel, parameter, setting):
+        if self.thinned[parameter]:
+            self.thin(track, channel, parameter, setting)
+        else:
+            self.processor.parameter(track, channel, parameter, setting)
+
+    def channel_pressure(self, track, channel, pressure):
+        self.thin(track, channel, CHANNEL_PRESSURE, pressure)
+
+    def pitch_wheel(self, track, channel, wheel):
+        self.thin(track, channel, PITCH_WHEEL, wheel)
+
+    def end_of_track(self, track):
+        # Values held for this track go before it ends.
+        self.release(track)
+        self.processor.end_of_track(track)
+
+    def release(self, track=None):
+        # Send all held values now, or only those held for TRACK.
+        now = self.now()
+        pending = []
+        for index in self.pending:
+            if track is None or self.held_track[index] is track:
+                self.send(self.held_track[index], index, self.held[index],
+                          now)
+            else:
+                pending.append(index)
+        self.pending = pending
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Event transforms.
+
+A Transform stands between a Decoder and a processor.  It transposes,
+remaps or merges channels, freezes programs, scales velocities and filters
+event types.  All of this is compiled into lookup tables once, when the
+Transform is built, so each event costs a few indexing operations.  The
+same tables apply in bulk to NumPy event arrays.
+"""
+
+import midi
+
+# Callback names which may be filtered out, with their event type.
+event_types = {'note_off': 0x80, 'note_on': 0x90, 'key_pressure': 0xa0,
+               'parameter': 0xb0, 'program': 0xc0,
+               'channel_pressure': 0xd0, 'pitch_wheel': 0xe0,
+               'sysex': 0xf0, 'meta_event_text': 0xff,
+               'meta_event_binary': 0xff}
+
+def build(processor, transpose=0, drum_channel=9, channels=None,
+          freeze_program=False, velocity=100, drop=()):
+    # Return PROCESSOR wrapped into a Transform, or PROCESSOR itself when
+    # no transformation is asked, so nothing is paid in this case.
+    if (transpose == 0 and channels is None and not freeze_program
+            and velocity == 100 and not drop):
+        return processor
+    return Transform(processor, transpose, drum_channel, channels,
+                     freeze_program, velocity, drop)
+
+class Transform(midi.Processor):
+    # TRANSPOSE is added to all pitches, except on DRUM_CHANNEL.  CHANNELS,
+    # if not None, maps each input channel to an output channel.  When
+    # FREEZE_PROGRAM, program changes are dropped.  VELOCITY is a
+    # percentage applied to note on velocities.  DROP lists callback names
+    # to filter out.
+
+    def __init__(self, processor, transpose=0, drum_channel=9,
+                 channels=None, freeze_program=False, velocity=100,
+                 drop=()):
+        self.processor = processor
+        if channels is None:
+            channels = range(16)
+        self.channels = list(channels)
+        assert len(self.channels) == 16, self.channels
+        # PITCHES gives, for each input channel, the output pitch for each
+        # input pitch, or None if that pitch falls out of range.
+        self.pitches = []
+        for channel in range(16):
+            if channel == drum_channel:
+                shift = 0
+            else:
+                shift = transpose
+            table = []
+            for pitch in range(128):
+                if 0 < pitch + shift < 128:
+                    table.append(pitch + shift)
+                else:
+                    table.append(None)
+            self.pitches.append(table)
+        # VELOCITIES keeps zero velocities to zero, as they turn notes off.
+        self.velocities = [0]
+        for value in range(1, 128):
+            self.velocities.append(
+                max(1, min(127, (value * velocity + 50) // 100)))
+        # Callbacks needing no change go straight to the processor.
+        for name in ('header', 'delay', 'set_status', 'sysex',
+                     'meta_event_text', 'meta_event_binary', 'end_of_track',
+                     'set_tempo', 'undefined', 'silence'):
+            setattr(self, name, getattr(processor, name))
+        self.drop = list(drop)
+        if freeze_program:
+            self.drop.append('program')
+        for name in self.drop:
+            setattr(self, name, self.ignore)
+
+    def ignore(self, *arguments):
+        pass
+
+    def note_off(self, track, channel, pitch, velocity):
+        pitch = self.pitches[channel][pitch]
+        if pitch is not None:
+            self.processor.note_off(track, self.channels[channel], pitch,
+                                    velocity)
+
+    def note_on(self, track, channel, pitch, velocity):
+        pitch = self.pitches[channel][pitch]
+        if pitch is not None:
+            self.processor.note_on(track, self.channels[channel], pitch,
+                                   self.velocities[velocity])
+
+    def key_pressure(self, track, channel, pitch, pressure):
+        pitch = self.pitches[channel][pitch]
+        if pitch is not None:
+            self.processor.key_pressure(track, self.channels[channel],
+                                        pitch, pressure)
+
+    def parameter(self, track, channel, parameter, setting):
+        self.processor.parameter(track, self.channels[channel], parameter,
+                                 setting)
+
+    def program(self, track, channel, program):
+        self.processor.program(track, self.channels[channel], program)
+
+    def channel_pressure(self, track, channel, pressure):
+        self.processor.channel_pressure(track, self.channels[channel],
+                                        pressure)
+
+    def pitch_wheel(self, track, channel, wheel):
+        self.processor.pitch_wheel(track, self.channels[channel], wheel)
+
+    def apply(self, events):
+        # Return a transformed copy of EVENTS, a NumPy event array as
+        # produced by Decoder.event_array().
+        import numpy
+        types = events['type']
+        keep = numpy.ones(len(events), bool)
+        for name in self.drop:
+            keep &= types != event_types[name]
+        events = events[keep]
+        types = events['type']
+        channels = events['channel'].astype(int)
+        pitched = (types == 0x80) | (types == 0x90) | (types == 0xa0)
+        pitches = numpy.array([[-1 if pitch is None else pitch
+                                for pitch in table]
+                               for table in self.pitches])
+        mapped = pitches[channels, numpy.where(pitched, events['data1'], 0)]
+        events = events[~pitched | (mapped >= 0)]
+        mapped = mapped[~pitched | (mapped >= 0)]
+        types = events['type']
+        pitched = (types == 0x80) | (types == 0x90) | (types == 0xa0)
+        events['data1'] = numpy.where(pitched, mapped, events['data1'])
+        ons = types == 0x90
+        velocities = numpy.array(self.velocities)
+        events['data2'][ons] = velocities[events['data2'][ons]]
+        events['channel'] = numpy.array(self.channels)[events['channel']]
+        return events
@@ -0,0 +1,523 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Transport control.
+
+A Transport plays a Decoder much like parallel_process, but obeys commands
+sent from any thread: pause, resume, seek to a bar or a time, change speed
+and stop.  The Transport is also the clock of the player, so a command
+wakes the player from its wait through a pipe, and takes effect within
+milliseconds.  Pausing turns sounding notes off at once, and resuming
+sounds them again, moving the player's time goal so nothing gets rushed.
+
+Seeking never decodes the file again.  Track positions and channel
+settings are remembered at each bar reached, so a seek restarts from the
+closest bar at or before the target, then goes muted over what is left,
+and finally sounds again notes held over the target.  Notes get indexed
+for this in a background thread, as soon as playback starts.
+"""
+
+import os, select, Queue
+import midi
+
+# Values restored for controllers not set at the seek target, by controller.
+# Other controllers, and other settings, restore to zero.
+defaults = {7: 100, 8: 64, 10: 64, 11: 127}
+
+# Controllers selecting a registered or non-registered parameter, as (MSB,
+# LSB), then controllers entering data for the selected parameter.  Data
+# increments and decrements are not kept, replaying them would not restore.
+selectors = {'rpn': (101, 100), 'nrpn': (99, 98)}
+DATA_ENTRY = 6, 38
+DATA_STEPS = 96, 97
+
+# Callbacks whose settings are independent of each other.
+channel_settings = 'parameter', 'program', 'channel_pressure', 'pitch_wheel'
+
+def keep_parameter(settings, track, channel, parameter, setting):
+    # Note in SETTINGS, as kept by the Tracker, that controller PARAMETER
+    # got SETTING on CHANNEL.  Data entries are kept under (KIND, CHANNEL,
+    # (MSB, LSB)), KIND being `rpn' or `nrpn', with a (MSB, LSB) value for
+    # the parameter then selected, None for data not entered.  ('select',
+    # CHANNEL, None) tells the KIND of the parameter selected last.
+    if parameter in DATA_ENTRY:
+        selected = settings.get(('select', channel, None))
+        if selected is None:
+            return
+        kind = selected[1]
+        number = tuple([settings.get(('parameter', channel, controller),
+                                     (None, 0))[1]
+                        for controller in selectors[kind]])
+        if number == (127, 127):
+            # The null parameter ignores data.
+            return
+        key = kind, channel, number
+        value = settings.get(key, (track, (None, None)))[1]
+        if parameter == DATA_ENTRY[0]:
+            value = setting, value[1]
+        else:
+            value = value[0], setting
+        settings[key] = track, value
+    elif parameter not in DATA_STEPS:
+        settings['parameter', channel, parameter] = track, setting
+        for kind, controllers in selectors.items():
+            if parameter in controllers:
+                settings['select', channel, None] = track, kind
+
+def restoring(current, wanted):
+    # Return (NAME, TRACK, ARGUMENTS) for callbacks bringing channel
+    # settings from CURRENT to WANTED, both as kept by the Tracker.  Each
+    # parameter needing data gets selected before its data is entered, and
+    # parameter selections as in WANTED come last.  Data for parameters not
+    # in WANTED is left alone, as nothing tells what it should be.
+    def independent(name, number):
+        return name in channel_settings and not (
+            name == 'parameter' and (number in selectors['rpn']
+                                     or number in selectors['nrpn']))
+    events = []
+    # Channels needing their parameter selection sent again, with a track.
+    channels = {}
+    for key in sorted(current):
+        name, channel, number = key
+        track, value = current[key]
+        if key in wanted:
+            continue
+        if independent(name, number):
+            if number is None:
+                events.append((name, track, (channel, 0)))
+            else:
+                events.append((name, track, (channel, number,
+                                             defaults.get(number, 0))))
+        elif name in ('parameter', 'select'):
+            channels.setdefault(channel, track)
+    for key in sorted(wanted):
+        name, channel, number = key
+        track, value = wanted[key]
+        if key in current and current[key][1] == value:
+            continue
+        if independent(name, number):
+            if number is None:
+                events.append((name, track, (channel, value)))
+            else:
+                events.append((name, track, (channel, number, value)))
+        elif name in selectors:
+            for controller, part in zip(selectors[name] + DATA_ENTRY,
+                                        number + value):
+                if part is not None:
+                    events.append(('parameter', track,
+                                   (channel, controller, part)))
+            channels[channel] = track
+        elif name in ('parameter', 'select'):
+            channels.setdefault(channel, track)
+    for channel, track in sorted(channels.items()):
+        selected = wanted.get(('select', channel, None))
+        if selected is None:
+            # Nothing was selected, leave the null parameter selected.
+            for controller in selectors['rpn']:
+                events.append(('parameter', track, (channel, controller,
+                                                    127)))
+            continue
+        kinds = [kind for kind in sorted(selectors) if kind != selected[1]]
+        for kind in kinds + [selected[1]]:
+            for controller in selectors[kind]:
+                entry = wanted.get(('parameter', channel, controller))
+                if entry is not None:
+                    events.append(('parameter', entry[0],
+                                   (channel, controller, entry[1])))
+    return events
+
+class Tracker(midi.Processor):
+    # Forward everything to PROCESSOR, remembering sounding notes and the
+    # latest channel settings.
+
+    def __init__(self, processor):
+        self.processor = processor
+        # NOTES maps (CHANNEL, PITCH) to (TRACK, VELOCITY).
+        self.notes = {}
+        # SETTINGS maps (CALLBACK NAME, CHANNEL, NUMBER) to (TRACK, VALUE),
+        # NUMBER being None for callbacks having no such argument, and also
+        # holds parameter data, see keep_parameter().
+        self.settings = {}
+        for name in ('header', 'delay', 'set_status', 'key_pressure',
+                     'sysex', 'meta_event_text', 'meta_event_binary',
+                     'end_of_track', 'set_tempo', 'undefined'):
+            setattr(self, name, getattr(processor, name))
+
+    def note_off(self, track, channel, pitch, velocity):
+        key = channel, pitch
+        if key in self.notes:
+            del self.notes[key]
+        self.processor.note_off(track, channel, pitch, velocity)
+
+    def note_on(self, track, channel, pitch, velocity):
+        key = channel, pitch
+        if velocity:
+            self.notes[key] = track, velocity
+        elif key in self.notes:
+            del self.notes[key]
+        self.processor.note_on(track, channel, pitch, velocity)
+
+    def parameter(self, track, channel, parameter, setting):
+        keep_parameter(self.settings, track, channel, parameter, setting)
+        self.processor.parameter(track, channel, parameter, setting)
+
+    def program(self, track, channel, program):
+        self.settings['program', channel, None] = track, program
+        self.processor.program(track, channel, program)
+
+    def channel_pressure(self, track, channel, pressure):
+        self.settings['channel_pressure', channel, None] = (
+            track, pressure)
+        self.processor.channel_pressure(track, channel, pressure)
+
+    def pitch_wheel(self, track, channel, wheel):
+        self.settings['pitch_wheel', channel, None] = track, wheel
+        self.processor.pitch_wheel(track, channel, wheel)
+
+    def silence(self):
+        # Turn all sounding notes off at once, and return them.
+        notes = self.notes
+        self.notes = {}
+        self.processor.silence()
+        return notes
+
+    def sound(self, notes):
+        # Sound again NOTES, as returned by silence().
+        for (channel, pitch), (track, velocity) in notes.items():
+            self.note_on(track, channel, pitch, velocity)
+
+    def restore(self, settings):
+        # Bring channel settings back to SETTINGS.  A setting is restored as
+        # coming from the track which last sent it.
+        processor = self.processor
+        for name, track, arguments in restoring(self.settings, settings):
+            getattr(processor, name)(track, *arguments)
+        self.settings = dict(settings)
+
+class Transport:
+    # Thread-safe playback control.  Give the Transport as CLOCK to the
+    # players, then call play().  Other methods may be called from any
+    # thread, their commands being obeyed in order.
+
+    def __init__(self, clock=None):
+        if clock is None:
+            from clock import wall_clock as clock
+        self.clock = clock
+        self.commands = Queue.Queue()
+        # Writing to the pipe wakes the player from its wait.
+        self.reader, self.writer = os.pipe()
+        self.stopped = False
+
+    # Commands.
+
+    def pause(self):
+        self.send('pause')
+
+    def resume(self):
+        self.send('resume')
+
+    def toggle(self):
+        self.send('toggle')
+
+    def seek_bar(self, bar):
+        # Seek to BAR, counted from 0.
+        self.send('seek_bar', bar)
+
+    def seek_seconds(self, seconds):
+        # Seek to SECONDS from the start, at the nominal speed.
+        self.send('seek_seconds', seconds)
+
+    def speed(self, speed_factor):
+        # Change speed, bigger the slower, 100 being the nominal speed.
+        self.send('speed', speed_factor)
+
+    def stop(self):
+        self.send('stop')
+
+    def send(self, *command):
+        self.commands.put(command)
+        os.write(self.writer, 'x')
+
+    # Clock interface, for the player.
+
+    def time(self):
+        return self.clock.time()
+
+    def sleep(self, seconds):
+        self.clock.sleep(seconds)
+
+    def wait(self, goal):
+        # Sleep until time GOAL, but return early when a command arrives.
+        while True:
+            now = self.clock.time()
+            if now >= goal:
+                return
+            if select.select([self.reader], [], [], goal - now)[0]:
+                return
+
+    # Playback.
+
+    def play(self, decoder, processor, players):
+        # Process DECODER through PROCESSOR, which sends to PLAYERS,
+        # midi.Player instances using this Transport as their clock, the
+        # first one being followed for time.  All get their time goal and
+        # rate adjusted by commands.  Return when the file ends, or when
+        # stopped.
+        self.decoder = decoder
+        self.tracker = Tracker(processor)
+        self.players = players
+        self.player = players[0]
+        self.run = run = decoder.run
+        self.paused = None
+        self.held = None
+        self.tempos = None
+        # CHECKPOINTS holds, per bar, (TICK, DELTA, TRACK STATES, SETTINGS).
+        self.checkpoints = []
+        self.ticks_per_bar = decoder.header.division * run.beats_per_bar
+        run.mute = False
+        # Index sounding notes in the background, for seeking.
+        self.indexer = None
+        if decoder.index is None:
+            import threading
+            self.indexer = threading.Thread(target=self.index_notes)
+            self.indexer.setDaemon(True)
+            self.indexer.start()
+        processor.header(decoder.header)
+        for track in decoder.tracks:
+            track.rewind()
+        # Events at TICK are due next, tracks deltas count from DELTA
+        # ticks before TICK.
+        self.tick = 0
+        self.delta = 0
+        run.bar = 0
+        if run.start_bar is not None:
+            self.seek(run.start_bar * self.ticks_per_bar)
+        while not self.stopped:
+            self.checkpoint()
+            delta = midi.dispatch_due(decoder.tracks, self.delta,
+                                      self.tracker)
+            if delta is None:
+                break
+            self.tick += delta
+            self.delta = delta
+            run.bar = self.tick // self.ticks_per_bar
+            if run.end_bar is not None and run.bar >= run.end_bar:
+                break
+            self.tracker.delay(delta)
+            self.settle()
+        self.tracker.silence()
+
+    def settle(self):
+        # Obey commands, until the player's goal is reached.
+        while not self.stopped:
+            self.obey()
+            if self.paused is None:
+                if self.clock.time() >= self.player.goal:
+                    return
+                self.wait(self.player.goal)
+            else:
+                select.select([self.reader], [], [])
+
+    def obey(self):
+        while True:
+            try:
+                command = self.commands.get_nowait()
+            except Queue.Empty:
+                break
+            os.read(self.reader, 1)
+            getattr(self, 'do_' + command[0])(*command[1:])
+
+    def do_pause(self):
+        if self.paused is None:
+            self.paused = self.clock.time()
+            self.held = self.tracker.silence()
+
+    def do_resume(self):
+        if self.paused is not None:
+            shift = self.clock.time() - self.paused
+            for player in self.players:
+                player.goal += shift
+            self.paused = None
+            self.tracker.sound(self.held)
+            self.held = None
+
+    def do_toggle(self):
+        if self.paused is None:
+            self.do_pause()
+        else:
+            self.do_resume()
+
+    def do_seek_bar(self, bar):
+        self.seek(bar * self.ticks_per_bar)
+
+    def do_seek_seconds(self, seconds):
+        self.seek(self.tick_at(seconds))
+
+    def do_speed(self, speed_factor):
+        # Scale the wait left, which is frozen while paused.
+        now = self.clock.time()
+        if self.paused is None:
+            start = now
+        else:
+            start = self.paused
+            self.paused = now
+        ratio = float(speed_factor) / self.run.speed_factor
+        self.run.speed_factor = speed_factor
+        for player in self.players:
+            player.set_tempo(None, player.tempo)
+            player.goal = now + (player.goal - start) * ratio
+
+    def do_stop(self):
+        self.stopped = True
+
+    def index_notes(self):
+        # Build the note index over copies of the tracks, as building it
+        # moves them.  Only positions get copied, not the file.
+        import copy, intervals
+        decoder = copy.copy(self.decoder)
+        decoder.tracks = [copy.copy(track) for track in decoder.tracks]
+        self.decoder.index = intervals.NoteIndex(decoder)
+
+    def checkpoint(self):
+        # Remember the state at the first event of a new bar.  Bars without
+        # events get the same state, taken later.
+        if self.run.bar >= len(self.checkpoints):
+            checkpoint = (self.tick, self.delta, self.states(),
+                          dict(self.tracker.settings))
+            while self.run.bar >= len(self.checkpoints):
+                self.checkpoints.append(checkpoint)
+
+    def states(self):
+        return [(track.position, track.delta, track.running_status)
+                for track in self.decoder.tracks]
+
+    def set_states(self, states):
+        for track, (position, delta, running_status) in zip(
+                self.decoder.tracks, states):
+            track.position = position
+            track.delta = delta
+            track.running_status = running_status
+
+    def seek(self, target):
+        # Continue playback at tick TARGET.
+        tracker = self.tracker
+        run = self.run
+        tracker.silence()
+        self.held = {}
+        if self.indexer is not None:
+            self.indexer.join()
+            self.indexer = None
+        index = self.decoder.index
+        if target < self.tick:
+            bar = min(target // self.ticks_per_bar,
+                      len(self.checkpoints) - 1)
+            while bar > 0 and self.checkpoints[bar][0] > target:
+                bar -= 1
+            self.tick, self.delta, states, settings = self.checkpoints[bar]
+            self.set_states(states)
+            tracker.restore(settings)
+        # Go muted up to TARGET, remembering bars on the way.
+        run.mute = True
+        tracks = self.decoder.tracks
+        while self.tick < target:
+            run.bar = self.tick // self.ticks_per_bar
+            self.checkpoint()
+            delta = midi.dispatch_due(tracks, self.delta, tracker)
+            if delta is None:
+                self.stopped = True
+                break
+            self.tick += delta
+            self.delta = delta
+        run.mute = False
+        run.bar = self.tick // self.ticks_per_bar
+        held = {}
+        for start, end, number, channel, pitch, velocity in (
+                index.sounding(target)):
+            if start < target:
+                for track in tracks:
+                    if track.number == number:
+                        held[channel, pitch] = track, velocity
+        if self.paused is None:
+            tracker.sound(held)
+        else:
+            self.held = held
+        # Events at TICK are due in (TICK - TARGET) ticks from now.
+        now = self.clock.time()
+        for player in self.players:
+            player.goal = now + max(0, self.tick - target) * player.time_rate
+        if self.paused is not None:
+            self.paused = self.clock.time()
+
+    def tick_at(self, seconds):
+        # Return the tick at SECONDS from the start, at the nominal speed.
+        if self.tempos is None:
+            import skim
+            tempos = []
+            for track in self.decoder.tracks:
+                tempos += skim.skim_track(track)[2]
+            self.tempos = sorted(tempos)
+        division = self.decoder.header.division
+        elapsed = 0.
+        start = 0
+        tempo = 500000
+        for tick, new_tempo in self.tempos:
+            duration = (tick - start) * 1e-6 * tempo / division
+            if elapsed + duration > seconds:
+                break
+            elapsed += duration
+            start = tick
+            tempo = new_tempo
+        return start + int((seconds - elapsed) / (1e-6 * tempo / division))
+
+    def serve(self, input):
+        # Obey commands read from INPUT, one per line, in a background
+        # thread.  See `joue --help' for the commands.
+        import threading
+        thread = threading.Thread(target=self.read_commands, args=(input,))
+        thread.setDaemon(True)
+        thread.start()
+
+    def read_commands(self, input):
+        import sys
+        while True:
+            line = input.readline()
+            if not line:
+                return
+            if not self.parse(line):
+                sys.stderr.write("Commands: p, b BAR, t SECONDS, s FACTOR,"
+                                 " q\n")
+            elif line.split() == ['q']:
+                return
+
+    def parse(self, line):
+        # Send the command written on LINE, return False if not understood.
+        fields = line.split()
+        try:
+            if not fields or fields == ['p']:
+                self.toggle()
+            elif fields[0] == 'b' and len(fields) == 2:
+                self.seek_bar(max(0, int(fields[1]) - 1))
+            elif fields[0] == 't' and len(fields) == 2:
+                self.seek_seconds(max(0., float(fields[1])))
+            elif fields[0] == 's' and len(fields) == 2:
+                self.speed(max(1, int(fields[1])))
+            elif fields == ['q']:
+                self.stop()
+            else:
+                return False
+        except ValueError:
+            return False
+        return True
+
+    def clear(self):
+        # Forget commands not obeyed yet, so a new play() starts afresh.
+        while True:
+            try:
+                self.commands.get_nowait()
+            except Queue.Empty:
+                break
+            os.read(self.reader, 1)
+        self.stopped = False
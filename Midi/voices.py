@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Sounding notes of an output.
+
+Voices counts note ons not yet turned off, in a flat table of 16 channels
+by 128 pitches, so overlapping note ons on the same key are not lost, and
+each note event costs a single index.  Releasing turns off everything at
+once: by All Sound Off and All Notes Off controllers on each channel
+having sounding notes, or, for devices ignoring these, by one note off per
+note on still counted.
+"""
+
+# Controllers turning off a whole channel.
+ALL_SOUND_OFF = 120
+ALL_NOTES_OFF = 123
+
+class Voices:
+
+    def __init__(self):
+        self.forget()
+
+    def forget(self):
+        # COUNTS is indexed by CHANNEL * 128 + PITCH.  ACTIVE counts note
+        # ons for each channel, so silent channels are quickly skipped, and
+        # PITCHES counts them for each pitch, over all channels.
+        self.counts = [0] * (16 * 128)
+        self.active = [0] * 16
+        self.pitches = [0] * 128
+
+    def __len__(self):
+        return sum(self.active)
+
+    def note_on(self, channel, pitch):
+        self.counts[channel << 7 | pitch] += 1
+        self.active[channel] += 1
+        self.pitches[pitch] += 1
+
+    def note_off(self, channel, pitch):
+        # Return True if this turned off the last note on for this key.
+        index = channel << 7 | pitch
+        count = self.counts[index]
+        if count:
+            self.counts[index] = count - 1
+            self.active[channel] -= 1
+            self.pitches[pitch] -= 1
+        return count == 1
+
+    def sounding(self):
+        # Return (CHANNEL, PITCH, COUNT) for all sounding keys.
+        counts = self.counts
+        found = []
+        for channel in range(16):
+            if self.active[channel]:
+                base = channel << 7
+                for pitch in range(128):
+                    if counts[base + pitch]:
+                        found.append((channel, pitch, counts[base + pitch]))
+        return found
+
+    def release(self, note_off, parameter=None):
+        # Turn off all sounding notes, then forget them.  If PARAMETER is
+        # given, call it as (CHANNEL, CONTROLLER, VALUE) for controllers
+        # silencing each active channel, otherwise call NOTE_OFF as
+        # (CHANNEL, PITCH) once for each note on.
+        if parameter is None:
+            for channel, pitch, count in self.sounding():
+                for counter in range(count):
+                    note_off(channel, pitch)
+        else:
+            for channel in range(16):
+                if self.active[channel]:
+                    parameter(channel, ALL_SOUND_OFF, 0)
+                    parameter(channel, ALL_NOTES_OFF, 0)
+        self.forget()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""\
+Find duplicate MIDI files.
+
+Usage: midi-dups.py [OPTION]... [DIRECTORY-OR-FILE]...
+
+  -b, --bars=BEATS       also find similar files, by bars of BEATS quarters
+  -s, --share=PERCENT    least share of bars for similar files, default is 80
+  -j, --jobs=NUMBER      number of worker processes, default is one per CPU
+
+Files are compared after normalization, so text metas, track order,
+running status encoding and division do not matter.  Directories are
+walked recursively for `.mid', `.midi' and `.kar' files, possibly `.gz'
+compressed.  With no argument, search the current directory.
+"""
+
+import sys
+
+def main(*arguments):
+    from Midi import fingerprint, playlist
+    beats_per_bar = None
+    share = 80
+    jobs = None
+    import getopt
+    options, arguments = getopt.getopt(arguments, 'b:j:s:',
+                                       ('bars=', 'jobs=', 'share='))
+    for option, value in options:
+        if option in ('-b', '--bars'):
+            beats_per_bar = int(value)
+        elif option in ('-j', '--jobs'):
+            jobs = int(value)
+        elif option in ('-s', '--share'):
+            share = int(value)
+    # Workers only send back digests, and files are read one at a time.
+    import multiprocessing
+    pool = multiprocessing.Pool(jobs)
+    results = []
+    write = sys.stderr.write
+    for name, digest, bars in pool.imap_unordered(
+            fingerprint.fingerprint_file,
+            [(name, beats_per_bar)
+             for name in playlist.find_files(arguments or ['.'])], 8):
+        if digest is None:
+            write("%s: %s\n" % (name, bars))
+        else:
+            results.append((name, digest, bars))
+    pool.close()
+    pool.join()
+    if beats_per_bar is None:
+        threshold = None
+    else:
+        threshold = share / 100.
+    exact, similar = fingerprint.clusters(results, threshold)
+    write = sys.stdout.write
+    for names in exact:
+        write("Same, %d files:\n" % len(names))
+        for name in names:
+            write("  %s\n" % name)
+    for share, names in similar:
+        write("Similar, %d%% of bars or more, %d files:\n"
+              % (int(100 * share), len(names)))
+        for name in names:
+            write("  %s\n" % name)
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
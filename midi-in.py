@@ -1,20 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""\
+Route live MIDI input to MIDI outputs.
+
+Usage: midi-in.py [OPTION]... [INPUT]...
+
+  -o, --output=DEVICE    write to raw MIDI DEVICE, may be repeated
+  -p, --port=PORT        use said ALSA port when no DEVICE, default is 128
+  -t, --transpose=NUM    number of semi-tones of transposition
+  -d, --drum=CHANNEL     drum channel, not to be transposed, default is 9
+  -m, --map=IN..OUT      map channels IN into channel OUT
+  -v, --velocity=FACTOR  scale note velocities, default is 100
+  -n, --thin=MS          thin controller values to one per MS milliseconds
+  -l, --latency          report latency distribution when done
+
+With no INPUT, read `/dev/midi'.  Interrupt to stop.
+"""
+
+import sys
+
 def main(*arguments):
-    input = file('/dev/midi')
-    from Midi import alsaport
-    output = alsaport.AlsaPort()
+    from Midi import midi, router
+    from Midi.main import decode_map, transformed
+    run = midi.Run()
+    outputs = []
+    port = 128
+    latency = False
+    thin = None
+    import getopt
+    options, arguments = getopt.getopt(
+        arguments, 'd:lm:n:o:p:t:v:',
+        ('drum=', 'latency', 'map=', 'output=', 'port=', 'thin=',
+         'transpose=', 'velocity='))
+    for option, value in options:
+        if option in ('-d', '--drum'):
+            run.drum_channel = int(value)
+        elif option in ('-l', '--latency'):
+            latency = True
+        elif option in ('-m', '--map'):
+            decode_map(value, run)
+        elif option in ('-n', '--thin'):
+            thin = int(value) / 1000.
+        elif option in ('-o', '--output'):
+            outputs.append(value)
+        elif option in ('-p', '--port'):
+            port = int(value)
+        elif option in ('-t', '--transpose'):
+            run.transpose = int(value)
+        elif option in ('-v', '--velocity'):
+            run.velocity = int(value)
+    if outputs:
+        import os
+        output = router.BatchWriter(
+            [os.open(name, os.O_WRONLY) for name in outputs])
+        flush = output.flush
+    else:
+        from Midi import alsaport
+        output = alsaport.AlsaPort(port)
+        flush = None
+    if thin is not None:
+        # Live input has no delays, so held values go by the clock.
+        import time
+        from Midi import thinner
+        output = thinner.Thinner(output, thin, clock=time.time)
+        flush = thinned(output, flush)
+    thru = router.Router(transformed(output, run), flush)
+    for name in arguments or ['/dev/midi']:
+        thru.add_input(name)
     try:
-        while True:
-            byte = ord(input.read(1))
-            if byte in (0xf8, 0xfe):
-                continue
-            if byte & 0xf0 == 0x90:
-                channel = byte & 0x0f
-                pitch = ord(input.read(1))
-                velocity = ord(input.read(1))
-                output.note_on(None, channel, pitch, velocity)
+        thru.run()
     except KeyboardInterrupt:
+        pass
+    if thin is not None:
+        output.release()
+        flush()
+        output = output.processor
+    if not outputs:
         output.close()
+    if latency:
+        thru.latency.report(sys.stderr.write)
+
+def thinned(thinner, flush):
+    # Return a flush function sending due values held by THINNER first.
+    def function():
+        hold = thinner.flush()
+        if flush is not None:
+            flush()
+        return hold
+    return function
 
 if __name__ == '__main__':
-    import sys
-    main(sys.argv[1:])
+    main(*sys.argv[1:])
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""\
+Index a MIDI library into a SQLite database.
+
+Usage: midi-index.py [OPTION]... [DIRECTORY-OR-FILE]...
+
+  -d, --database=FILE    use FILE as the index, default is `midi-index.db'
+  -j, --jobs=NUMBER      number of worker processes, default is one per CPU
+
+Directories are walked recursively for `.mid', `.midi' and `.kar' files,
+possibly `.gz' compressed.  Only files whose size or modification time
+changed since the previous run get decoded again.  With no argument, index
+the current directory.  Tables are `files', `tracks', `programs' and
+`texts', the latter holding track names, lyrics and all other texts.
+"""
+
+import sys
+
+def main(*arguments):
+    from Midi import catalog
+    database = 'midi-index.db'
+    jobs = None
+    import getopt
+    options, arguments = getopt.getopt(arguments, 'd:j:',
+                                       ('database=', 'jobs='))
+    for option, value in options:
+        if option in ('-d', '--database'):
+            database = value
+        elif option in ('-j', '--jobs'):
+            jobs = int(value)
+    index = catalog.Catalog(database)
+    unchanged, described, forgotten = index.update(
+        list(arguments) or ['.'], jobs, sys.stderr.write)
+    index.close()
+    sys.stderr.write("%d files unchanged, %d indexed, %d forgotten\n"
+                     % (unchanged, described, forgotten))
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -14,9 +14,12 @@ alsa = Extension('Midi.alsa',
                  ['src/alsa.pyx', 'src/mymidikbd.c'],
                  libraries=['asound'])
 
+# Optional, `Midi/midi.py' falls back to pure Python without it.
+accel = Extension('Midi.accel', ['src/accel.pyx'])
+
 setup(name=__package__, version=__version__,
       description="MIDI tools for Python",
       author='François Pinard', author_email='pinard@iro.umontreal.ca',
       url='http://www.iro.umontreal.ca/~pinard',
-      ext_modules=[alsa], cmdclass={'build_ext': build_ext},
+      ext_modules=[alsa, accel], cmdclass={'build_ext': build_ext},
       scripts=['joue'], packages=['Midi'])
@@ -0,0 +1,317 @@
+# Compiled accelerator for the decoding loops of `Midi/midi.py'.
+#
+# Functions here behave exactly like their pure Python counterparts in
+# `midi.py', calling the same processor methods with the same arguments.
+# `midi.py' uses them automatically whenever this module has been built.
+
+cdef extern from "Python.h":
+    char *PyByteArray_AS_STRING(object bytearray)
+
+text_messages = {0x01: "Text", 0x02: "Copyright", 0x03: "Sequence/Track",
+                 0x04: "Instrument", 0x05: "Lyric", 0x06: "Marker",
+                 0x07: "Cue"}
+
+binary_messages = {0x54: "SMPTE Offset", 0x58: "Time Signature",
+                   0x59: "Key Signature", 0x7f: "Sequencer-Specific"}
+
+cdef long decode_intvar(unsigned char *buffer, long *position,
+                        long limit) except -1:
+    cdef long value
+    cdef int byte
+    value = 0
+    while 1:
+        if position[0] >= limit:
+            raise AssertionError((position[0], limit))
+        byte = buffer[position[0]]
+        position[0] = position[0] + 1
+        value = (value << 7) | (byte & 0x7f)
+        if not byte & 0x80:
+            return value
+
+cdef int decode_int7(unsigned char *buffer, long *position,
+                     long limit) except -1:
+    cdef int value
+    if position[0] >= limit:
+        raise AssertionError((position[0], limit))
+    value = buffer[position[0]]
+    if value & 0x80:
+        raise AssertionError((position[0], value))
+    position[0] = position[0] + 1
+    return value
+
+def dispatch_event(track, processor):
+    cdef unsigned char *buffer
+    cdef long position, limit, length, value
+    cdef int byte, event, nibble, channel, first, second, counter
+    buffer = <unsigned char *>PyByteArray_AS_STRING(track.buffer)
+    position = track.position
+    limit = track.limit
+    if position >= limit:
+        raise AssertionError((position, limit))
+    byte = buffer[position]
+    if byte & 0x80:
+        event = byte
+        position = position + 1
+        if event < 0xf0:
+            track.running_status = event
+    else:
+        if track.running_status is None:
+            raise AssertionError
+        event = track.running_status
+        processor.set_status(track, event)
+    nibble = event & 0xf0
+    channel = event & 0x0f
+    if nibble == 0x80:
+        first = decode_int7(buffer, &position, limit)
+        second = decode_int7(buffer, &position, limit)
+        track.position = position
+        processor.note_off(track, channel, first, second)
+    elif nibble == 0x90:
+        first = decode_int7(buffer, &position, limit)
+        second = decode_int7(buffer, &position, limit)
+        track.position = position
+        # While muted, only let notes be turned off.
+        if not (second and track.run.mute):
+            processor.note_on(track, channel, first, second)
+    elif nibble == 0xa0:
+        first = decode_int7(buffer, &position, limit)
+        second = decode_int7(buffer, &position, limit)
+        track.position = position
+        processor.key_pressure(track, channel, first, second)
+    elif nibble == 0xb0:
+        first = decode_int7(buffer, &position, limit)
+        second = decode_int7(buffer, &position, limit)
+        track.position = position
+        processor.parameter(track, channel, first, second)
+    elif nibble == 0xc0:
+        first = decode_int7(buffer, &position, limit)
+        track.position = position
+        processor.program(track, channel, first)
+    elif nibble == 0xd0:
+        first = decode_int7(buffer, &position, limit)
+        track.position = position
+        processor.channel_pressure(track, channel, first)
+    elif nibble == 0xe0:
+        first = decode_int7(buffer, &position, limit)
+        second = decode_int7(buffer, &position, limit)
+        track.position = position
+        value = first | (second << 7)
+        processor.pitch_wheel(track, channel, value - 0x2000)
+    else:
+        track.running_status = None
+        if event == 0xf0 or event == 0xf7:
+            # Sysex event, or its continuation.
+            length = decode_intvar(buffer, &position, limit)
+            if position + length > limit:
+                raise AssertionError((position, limit))
+            track.position = position + length
+            processor.sysex(track, track.view[position:position+length],
+                            event == 0xf7)
+            position = position + length
+        elif event == 0xff:
+            # Meta-event.
+            byte = decode_int7(buffer, &position, limit)
+            length = decode_intvar(buffer, &position, limit)
+            if position + length > limit:
+                raise AssertionError((position, limit))
+            if byte == 0x2f:
+                # End of track.
+                if length != 0:
+                    raise AssertionError(length)
+                track.position = position
+                processor.end_of_track(track)
+            elif byte == 0x51:
+                # Set Tempo.
+                if length != 3:
+                    raise AssertionError(length)
+                value = ((buffer[position] << 16) | (buffer[position+1] << 8)
+                         | buffer[position+2])
+                track.position = position + 3
+                processor.set_tempo(track, value)
+            else:
+                track.position = position + length
+                if byte in text_messages:
+                    processor.meta_event_text(
+                        track, track.view[position:position+length],
+                        text_messages[byte])
+                elif byte in binary_messages:
+                    processor.meta_event_binary(
+                        track, track.view[position:position+length],
+                        binary_messages[byte])
+                else:
+                    processor.meta_event_binary(
+                        track, track.view[position:position+length],
+                        "Meta Event %02x" % byte)
+            position = position + length
+        else:
+            # Undefined.
+            counter = 1
+            while position + counter < limit:
+                if buffer[position+counter] & 0x80:
+                    break
+                counter = counter + 1
+            processor.undefined(track, event,
+                                track.view[position:position+counter])
+            position = position + counter
+    if position < limit:
+        track.delta = decode_intvar(buffer, &position, limit)
+    else:
+        track.delta = None
+    track.position = position
+
+def dispatch_due(tracks, delta, processor):
+    # Advance all TRACKS by DELTA, dispatching events which become due,
+    # and return the smallest delta left, or None when all tracks ended.
+    minimum = None
+    for track in tracks:
+        if track.delta is not None:
+            track.delta = track.delta - delta
+            while track.delta == 0:
+                dispatch_event(track, processor)
+            if track.delta is not None:
+                if minimum is None or track.delta < minimum:
+                    minimum = track.delta
+    return minimum
+
+cdef void store(unsigned char *record, int offset, long value, int size):
+    # Store VALUE little-endian over SIZE bytes, from OFFSET in RECORD.
+    cdef int counter
+    for counter from 0 <= counter < size:
+        record[offset+counter] = (value >> (8 * counter)) & 0xff
+
+def tabulate_track(track):
+    # Return (RECORDS, TEMPOS) for TRACK, without calling any processor.
+    # RECORDS is a string of channel events, laid out as `event_dtype' in
+    # `arrays.py', seconds left to zero.  TEMPOS lists (TICK, TEMPO).
+    cdef unsigned char *buffer
+    cdef unsigned char *record
+    cdef long position, limit, tick, length, count
+    cdef int byte, event, running, first, second, number
+    buffer = <unsigned char *>PyByteArray_AS_STRING(track.buffer)
+    position = track.start + 8
+    limit = track.limit
+    number = track.number
+    # Each channel event uses at least two bytes, delta time included.
+    records = bytearray(24 * ((limit - position) // 2 + 1))
+    record = <unsigned char *>PyByteArray_AS_STRING(records)
+    count = 0
+    tempos = []
+    running = 0
+    tick = 0
+    while position < limit:
+        tick = tick + decode_intvar(buffer, &position, limit)
+        if position >= limit:
+            raise AssertionError((position, limit))
+        byte = buffer[position]
+        if byte & 0x80:
+            event = byte
+            position = position + 1
+            if event < 0xf0:
+                running = event
+        else:
+            if running < 0:
+                raise AssertionError
+            event = running
+        if event < 0xf0:
+            first = decode_int7(buffer, &position, limit)
+            second = 0
+            if (event & 0xf0) != 0xc0 and (event & 0xf0) != 0xd0:
+                second = decode_int7(buffer, &position, limit)
+            if (event & 0xf0) == 0xe0:
+                first = (first | (second << 7)) - 0x2000
+                second = 0
+            store(record, 0, tick, 8)
+            store(record, 8, 0, 8)
+            store(record, 16, number, 2)
+            store(record, 18, event & 0x0f, 1)
+            store(record, 19, event & 0xf0, 1)
+            store(record, 20, first, 2)
+            store(record, 22, second, 2)
+            record = record + 24
+            count = count + 1
+        elif event == 0xff:
+            running = -1
+            byte = decode_int7(buffer, &position, limit)
+            length = decode_intvar(buffer, &position, limit)
+            if position + length > limit:
+                raise AssertionError((position, limit))
+            if byte == 0x51:
+                if length != 3:
+                    raise AssertionError(length)
+                tempos.append((tick, (buffer[position] << 16)
+                               | (buffer[position+1] << 8)
+                               | buffer[position+2]))
+            position = position + length
+        elif event == 0xf0 or event == 0xf7:
+            running = -1
+            length = decode_intvar(buffer, &position, limit)
+            if position + length > limit:
+                raise AssertionError((position, limit))
+            position = position + length
+        else:
+            running = -1
+            length = 1
+            while position + length < limit:
+                if buffer[position+length] & 0x80:
+                    break
+                length = length + 1
+            position = position + length
+    return str(records[:24*count]), tempos
+
+def skim_track(track):
+    # Return (TICKS, EVENTS, TEMPOS, SIGNATURES) for TRACK, exactly as
+    # `skim_track' in `skim.py'.
+    cdef unsigned char *buffer
+    cdef long position, limit, tick, length, events
+    cdef int byte, event, running, kind
+    buffer = <unsigned char *>PyByteArray_AS_STRING(track.buffer)
+    position = track.start + 8
+    limit = track.limit
+    tick = 0
+    events = 0
+    running = 0
+    tempos = []
+    signatures = []
+    while position < limit:
+        tick = tick + decode_intvar(buffer, &position, limit)
+        if position >= limit:
+            raise AssertionError((position, limit))
+        event = buffer[position]
+        if event & 0x80:
+            position = position + 1
+            if event < 0xf0:
+                running = event
+        else:
+            event = running
+        events = events + 1
+        if event >= 0x80 and event < 0xf0:
+            if (event & 0xf0) == 0xc0 or (event & 0xf0) == 0xd0:
+                position = position + 1
+            else:
+                position = position + 2
+        elif event == 0xff or event == 0xf0 or event == 0xf7:
+            kind = -1
+            if event == 0xff:
+                if position >= limit:
+                    raise AssertionError((position, limit))
+                kind = buffer[position]
+                position = position + 1
+            length = decode_intvar(buffer, &position, limit)
+            if position + length > limit:
+                raise AssertionError((position, limit))
+            if kind == 0x51 and length == 3:
+                tempos.append((tick, (buffer[position] << 16)
+                               | (buffer[position+1] << 8)
+                               | buffer[position+2]))
+            elif kind == 0x58 and length >= 2:
+                signatures.append((tick, buffer[position],
+                                   buffer[position+1]))
+            position = position + length
+        else:
+            while position < limit:
+                if buffer[position] & 0x80:
+                    break
+                position = position + 1
+    if position != limit:
+        raise AssertionError((position, limit))
+    return tick, events, tempos, signatures
@@ -0,0 +1,38 @@
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+"""\
+MIDI tools for Python - Tests.
+
+Run them from the top directory with `python -m unittest discover'.
+Files are built in memory, and players are driven by a VirtualClock, so
+no MIDI device nor sound hardware is needed.
+"""
+
+import StringIO, struct
+from Midi import midi
+
+def track(*events):
+    # Return an MTrk chunk made of EVENTS, each being a delta time followed
+    # by the raw event bytes, an end of track being added.
+    data = []
+    for delta, bytes in events + ((0, '\xff\x2f\x00'),):
+        value = delta & 0x7f
+        delta >>= 7
+        while delta:
+            value = value << 8 | 0x80 | delta & 0x7f
+            delta >>= 7
+        while True:
+            data.append(chr(value & 0xff))
+            if not value & 0x80:
+                break
+            value >>= 8
+        data.append(bytes)
+    data = ''.join(data)
+    return 'MTrk' + struct.pack('>L', len(data)) + data
+
+def decoder(tracks, division=96, run=None):
+    # Return a Decoder for a format 1 file holding TRACKS, MTrk chunks.
+    header = 'MThd' + struct.pack('>LHHH', 6, 1, len(tracks), division)
+    return midi.Decoder(StringIO.StringIO(header + ''.join(tracks)), run)
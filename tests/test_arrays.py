@@ -0,0 +1,35 @@
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+import multiprocessing, unittest
+import tests
+from Midi import arrays
+
+def notes(pitch):
+    return tests.track((0, '\x90' + chr(pitch) + '\x64'),
+                       (96, '\x80' + chr(pitch) + '\x00'))
+
+def failing(arguments):
+    raise ValueError(arguments)
+
+class ParallelTest(unittest.TestCase):
+
+    def test_same_as_serial(self):
+        decoder = tests.decoder([notes(60), notes(64), notes(67)])
+        serial = arrays.event_array(decoder)
+        parallel = arrays.event_array(decoder, 2)
+        self.assertEqual(serial.tolist(), parallel.tolist())
+
+    def test_workers_terminated_on_failure(self):
+        decoder = tests.decoder([notes(60), notes(64)])
+        saved = arrays.tabulate_shared
+        arrays.tabulate_shared = failing
+        try:
+            self.assertRaises(ValueError, arrays.event_array, decoder, 2)
+        finally:
+            arrays.tabulate_shared = saved
+        self.assertEqual(multiprocessing.active_children(), [])
+
+if __name__ == '__main__':
+    unittest.main()
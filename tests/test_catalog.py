@@ -0,0 +1,52 @@
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+import os, shutil, tempfile, unittest
+import tests
+from Midi import catalog
+
+HEADER = 'MThd\0\0\0\6\0\1\0\1\0\x60'
+
+class CatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, contents):
+        name = os.path.join(self.directory, name)
+        file(name, 'wb').write(contents)
+        return name
+
+    def test_null_tempo(self):
+        name = self.write('null.mid', HEADER + tests.track(
+            (0, '\xff\x51\x03\0\0\0'), (0, '\x90\x3c\x64'),
+            (96, '\x80\x3c\x00')))
+        name, error, values, tracks, programs, texts = (
+            catalog.describe_file(name))
+        self.assertEqual(error, None)
+        self.assertEqual(values[-3:], (None, None, None))
+
+    def test_bad_file_recorded(self):
+        self.write('good.mid', HEADER + tests.track((0, '\x90\x3c\x64'),
+                                                    (96, '\x80\x3c\x00')))
+        self.write('bad.mid', 'MThd\0\0\0\6')
+        errors = []
+        index = catalog.Catalog(os.path.join(self.directory, 'index.db'))
+        try:
+            self.assertEqual(index.update([self.directory], 1, errors.append),
+                             (0, 2, 0))
+            rows = index.connection.execute(
+                'select name, error is null from files order by name')
+            self.assertEqual([(os.path.basename(name), ok)
+                              for name, ok in rows],
+                             [('bad.mid', 0), ('good.mid', 1)])
+        finally:
+            index.close()
+        self.assertEqual(len(errors), 1)
+
+if __name__ == '__main__':
+    unittest.main()
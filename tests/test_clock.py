@@ -0,0 +1,47 @@
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+import unittest
+import tests
+from Midi import midi
+from Midi.clock import VirtualClock, Recorder
+
+# A quarter note on each of two tracks, the second one starting a beat
+# later, and the tempo doubling after two beats.
+TRACKS = [tests.track((0, '\x90\x3c\x64'), (96, '\x80\x3c\x00'),
+                      (96, '\xff\x51\x03\x03\xd0\x90'),
+                      (0, '\x90\x3e\x64'), (96, '\x80\x3e\x00')),
+          tests.track((96, '\x90\x40\x64'), (96, '\x80\x40\x00'))]
+
+class TimingTest(unittest.TestCase):
+
+    def play(self, run=None, lag=0.):
+        clock = VirtualClock(100., lag)
+        tests.decoder(TRACKS, run=run).parallel_process(Recorder(clock))
+        return [(round(time - 100., 6), name, arguments)
+                for time, name, arguments in clock.events]
+
+    def test_schedule(self):
+        self.assertEqual(self.play(), [
+            (0., 'note_on', (0, 60, 100)),
+            (.5, 'note_off', (0, 60, 0)),
+            (.5, 'note_on', (0, 64, 100)),
+            (1., 'note_on', (0, 62, 100)),
+            (1., 'note_off', (0, 64, 0)),
+            (1.25, 'note_off', (0, 62, 0))])
+
+    def test_speed_factor(self):
+        run = midi.Run()
+        run.speed_factor = 200
+        self.assertEqual([time for time, name, arguments
+                          in self.play(run)], [0., 1., 1., 2., 2., 2.5])
+
+    def test_lag_does_not_accumulate(self):
+        # Late events are sent at once, and the beat is kept.
+        self.assertEqual([time for time, name, arguments
+                          in self.play(lag=.1)],
+                         [0., .5, .6, 1., 1.1, 1.25])
+
+if __name__ == '__main__':
+    unittest.main()
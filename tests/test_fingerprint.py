@@ -0,0 +1,61 @@
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+import os, tempfile, unittest
+import tests
+from Midi import fingerprint
+
+class FingerprintTest(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.name = tempfile.mkstemp('.mid')
+        os.close(handle)
+
+    def tearDown(self):
+        os.unlink(self.name)
+
+    def fingerprint(self, contents):
+        file(self.name, 'wb').write(contents)
+        return fingerprint.fingerprint_file((self.name, None))
+
+    def test_undefined_event(self):
+        header = 'MThd\0\0\0\6\0\1\0\1\0\x60'
+        name, digest, bars = self.fingerprint(
+            header + tests.track((0, '\xf4\x01'), (128, '\x90\x3c\x64'),
+                                 (96, '\x80\x3c\x00')))
+        self.assertNotEqual(digest, None)
+
+    def test_failure_reported(self):
+        name, digest, bars = self.fingerprint('MThd\0\0\0\6')
+        self.assertEqual(digest, None)
+        self.assert_(bars)
+
+class BarsTest(unittest.TestCase):
+
+    def bars(self, ticks):
+        # Return bar digests, by bars of 4 quarter notes, for one note
+        # starting at each of TICKS, each note having its own pitch.
+        events = []
+        previous = 0
+        for pitch, tick in enumerate(ticks):
+            events.append((tick - previous, '\x90' + chr(60 + pitch) + '\x64'))
+            previous = tick
+        return fingerprint.fingerprint(tests.decoder(
+            [tests.track(*events)]), 4).bars
+
+    def test_bar_alignment(self):
+        bars = self.bars([0, 96, 192, 384, 480, 1152, 1248])
+        self.assertEqual(len(bars), 4)
+        self.assertEqual(bars[2], None)
+        self.assertEqual(len(dict.fromkeys(bars)), 4)
+
+    def test_bar_digest_is_local(self):
+        # The same bar gives the same digest, wherever it is.
+        first = self.bars([0, 96, 192])
+        second = self.bars([0, 96, 192, 384, 480, 576])
+        self.assertEqual(len(first), 1)
+        self.assertEqual(second[0], first[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+import unittest
+import tests
+from Midi.loop import Loop
+
+# Pitch bend range of 12 semitones, then the null parameter.
+BEND_RANGE = ((101, 0), (100, 0), (6, 12), (38, 0), (101, 127), (100, 127))
+
+def parameters(entries):
+    return [arguments[1:] for delta, name, track, arguments in entries
+            if name == 'parameter']
+
+class LoopTest(unittest.TestCase):
+
+    def test_prelude_selects_before_data(self):
+        events = [(0, '\xb0' + chr(number) + chr(value))
+                  for number, value in BEND_RANGE]
+        events += [(96, '\x90\x3c\x64'), (96, '\x80\x3c\x00'),
+                   (96, '\x90\x3e\x64'), (96, '\x80\x3e\x00')]
+        loop = Loop(tests.decoder([tests.track(*events)]), 2, 4)
+        self.assertEqual(parameters(loop.prelude), list(BEND_RANGE))
+        self.assertEqual(parameters(loop.wrap), [])
+
+    def test_wrap_restores_data_changed_in_loop(self):
+        events = [(0, '\xb0' + chr(number) + chr(value))
+                  for number, value in BEND_RANGE]
+        events += [(96, '\x90\x3c\x64'), (0, '\xb0\x65\x00'),
+                   (0, '\xb0\x64\x00'), (0, '\xb0\x06\x02'),
+                   (96, '\x80\x3c\x00')]
+        loop = Loop(tests.decoder([tests.track(*events)]), 1, 3)
+        self.assertEqual(parameters(loop.wrap), list(BEND_RANGE))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+import unittest
+import tests
+
+# A note on each beat for 24 beats.
+NOTES = ((0, '\x90\x3c\x64'), (96, '\x80\x3c\x00')) * 24
+
+def signature(numerator):
+    return 0, '\xff\x58\x04' + chr(numerator) + '\x02\x18\x08'
+
+class MatrixTest(unittest.TestCase):
+
+    def report(self, matrix):
+        lines = []
+        matrix.report(lines.append)
+        return ''.join(lines).split('\n')[0]
+
+    def test_default_bars_follow_factor(self):
+        matrix = tests.decoder([tests.track(*NOTES)]).matrix()
+        self.assertEqual(len(matrix.starts), 6)
+        self.assertEqual(matrix.beats_per_bar(), 4)
+        self.assertEqual(self.report(matrix),
+                         "6 bars, 1 tracks, same bars as -b 4x")
+
+    def test_three_four(self):
+        matrix = tests.decoder(
+            [tests.track(signature(3), *NOTES)]).matrix()
+        self.assertEqual(len(matrix.starts), 8)
+        self.assertEqual(matrix.beats_per_bar(), 3)
+
+    def test_varying_bars(self):
+        matrix = tests.decoder(
+            [tests.track(signature(4), (384, '\xff\x58\x04\x03\x02\x18\x08'),
+                         *NOTES)]).matrix()
+        self.assertEqual(matrix.beats_per_bar(), None)
+        self.assert_('vary' in self.report(matrix))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+import StringIO, os, sys, tempfile, unittest
+import tests
+from Midi.clock import VirtualClock
+from Midi.midiport import MidiPort
+
+class PacerTest(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.name = tempfile.mkstemp()
+        os.close(handle)
+        self.clock = VirtualClock()
+        self.port = MidiPort(self.name, clock=self.clock)
+        self.port.header(tests.decoder([tests.track()]).header)
+
+    def tearDown(self):
+        self.port.close()
+        os.unlink(self.name)
+
+    def wire(self):
+        # Return bytes sent so far, once what is due got flushed.
+        self.port.delay(0)
+        return open(self.name, 'rb').read()
+
+    def test_bank_select_precedes_program(self):
+        port = self.port
+        port.parameter(None, 0, 0, 1)
+        port.parameter(None, 0, 32, 2)
+        port.program(None, 0, 5)
+        port.note_on(None, 0, 60, 100)
+        self.assertEqual(self.wire(), '\xb0\x00\x01\xb0\x20\x02\xc0\x05'
+                                      '\x90\x3c\x64')
+
+    def test_registered_parameter_kept_whole(self):
+        # Pitch bend range of 12 semitones, then the null parameter.
+        port = self.port
+        for parameter, setting in ((101, 0), (100, 0), (6, 12), (38, 0),
+                                   (101, 127), (100, 127)):
+            port.parameter(None, 0, parameter, setting)
+        self.assertEqual(self.wire(), '\xb0\x65\x00\xb0\x64\x00\xb0\x06\x0c'
+                                      '\xb0\x26\x00\xb0\x65\x7f\xb0\x64\x7f')
+        self.assertEqual(port.pacer.coalesced, 0)
+
+    def test_no_coalescing_while_wire_free(self):
+        port = self.port
+        port.parameter(None, 0, 7, 10)
+        port.parameter(None, 0, 7, 20)
+        port.pitch_wheel(None, 0, 0)
+        port.pitch_wheel(None, 0, 100)
+        self.assertEqual(self.wire(), '\xb0\x07\x0a\xb0\x07\x14'
+                                      '\xe0\x00\x40\xe0\x64\x40')
+        self.assertEqual(port.pacer.coalesced, 0)
+
+class SlowWireTest(unittest.TestCase):
+    # At 300 bytes per second, each message keeps the wire busy for 10 ms,
+    # while a tick lasts 5.2 ms.
+
+    def test_values_coalesced_while_behind(self):
+        handle, name = tempfile.mkstemp()
+        os.close(handle)
+        clock = VirtualClock()
+        port = MidiPort(name, 300, clock)
+        sent = []
+        port.pacer.write = lambda bytes: sent.append((clock.time(), bytes))
+        try:
+            port.header(tests.decoder([tests.track()]).header)
+            port.note_on(None, 0, 60, 100)
+            for volume in 1, 2, 3, 4:
+                port.parameter(None, 0, 7, volume)
+                port.delay(1)
+            port.delay(100)
+            self.assertEqual([bytes for time, bytes in sent],
+                             ['\x90\x3c\x64', '\xb0\x07\x02',
+                              '\xb0\x07\x04'])
+            for (time, bytes), expected in zip(sent, (0., .01, .02)):
+                self.assertAlmostEqual(time, expected)
+            self.assertEqual(port.pacer.coalesced, 2)
+            # Waiting for the wire never delays the beat.
+            self.assertAlmostEqual(clock.time(), 104 * .5 / 96)
+        finally:
+            # close() reports the lag on Standard Error, keep it quiet.
+            saved = sys.stderr
+            sys.stderr = StringIO.StringIO()
+            try:
+                port.close()
+            finally:
+                sys.stderr = saved
+            os.unlink(name)
+
+if __name__ == '__main__':
+    unittest.main()
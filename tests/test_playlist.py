@@ -0,0 +1,43 @@
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+import unittest
+import tests
+from Midi import midi, playlist
+from Midi.dumper import Dumper
+
+def volume_file(volume):
+    # A file setting the volume of channel 0, then playing one note.
+    return tests.decoder([tests.track((0, '\xb0\x07' + chr(volume)),
+                                      (0, '\x90\x3c\x64'),
+                                      (96, '\x80\x3c\x00'))])
+
+class WatcherTest(unittest.TestCase):
+
+    def test_reset_between_files(self):
+        lines = []
+        dumper = Dumper(lines.append, midi.DUMP_EVENTS)
+        playlist.play([('a.mid', volume_file(50)), ('b.mid', volume_file(90))],
+                      dumper)
+        parameters = [line for line in lines if 'parameter' in line]
+        self.assertEqual(parameters, ['trk1  ch0  parameter 7 50\n',
+                                      'trk1  ch0  parameter 121 0\n',
+                                      'trk1  ch0  parameter 7 90\n'])
+
+class PrefetcherTest(unittest.TestCase):
+
+    def test_failures_reported_per_file(self):
+        def decode(name, run):
+            if name == 'bad.mid':
+                raise TypeError('odd event')
+            return volume_file(50)
+        decoders = list(playlist.Prefetcher(['a.mid', 'bad.mid', 'b.mid'],
+                                            decode, midi.Run()))
+        self.assertEqual([name for name, decoder in decoders],
+                         ['a.mid', 'bad.mid', 'b.mid'])
+        self.assert_(isinstance(decoders[1][1], TypeError))
+        self.assert_(isinstance(decoders[2][1], midi.Decoder))
+
+if __name__ == '__main__':
+    unittest.main()
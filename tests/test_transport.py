@@ -0,0 +1,81 @@
+# -*- coding: UTF-8 -*-
+# Copyright © 1995, 1998, 2000, 2003 Progiciels Bourbeau-Pinard inc.
+# François Pinard <pinard@iro.umontreal.ca>.
+
+import unittest
+import tests
+from Midi import midi
+from Midi.clock import VirtualClock, Recorder
+from Midi.dumper import Dumper
+from Midi.transport import Tracker, Transport
+
+class TrackerTest(unittest.TestCase):
+
+    def test_restore_from_real_tracks(self):
+        lines = []
+        tracks = tests.decoder([tests.track(), tests.track()]).tracks
+        tracker = Tracker(Dumper(lines.append, midi.DUMP_EVENTS))
+        tracker.parameter(tracks[1], 0, 7, 50)
+        settings = dict(tracker.settings)
+        tracker.parameter(tracks[0], 0, 7, 90)
+        tracker.program(tracks[0], 1, 5)
+        del lines[:]
+        tracker.restore(settings)
+        self.assertEqual(sorted(lines), ['trk1  ch1  program 0\n',
+                                         'trk2  ch0  parameter 7 50\n'])
+
+    def test_restore_parameter_data_in_order(self):
+        lines = []
+        track = tests.decoder([tests.track()]).tracks[0]
+        tracker = Tracker(Dumper(lines.append, midi.DUMP_EVENTS))
+        def send(*pairs):
+            for parameter, setting in pairs:
+                tracker.parameter(track, 0, parameter, setting)
+        # Pitch bend range of 12 semitones, then of 2.
+        send((101, 0), (100, 0), (6, 12), (38, 0), (101, 127), (100, 127))
+        settings = dict(tracker.settings)
+        send((101, 0), (100, 0), (6, 2), (101, 127), (100, 127))
+        del lines[:]
+        tracker.restore(settings)
+        self.assertEqual(lines, ['trk1  ch0  parameter %d %d\n' % pair
+                                 for pair in ((101, 0), (100, 0), (6, 12),
+                                              (38, 0), (101, 127),
+                                              (100, 127))])
+        # Data is not reset on its own, the null parameter gets selected.
+        del lines[:]
+        tracker.restore({})
+        self.assertEqual(lines, ['trk1  ch0  parameter 101 127\n',
+                                 'trk1  ch0  parameter 100 127\n'])
+
+class TransportTest(unittest.TestCase):
+
+    def setUp(self):
+        # A transport in the middle of playing, with two players both due
+        # one second from now.
+        self.clock = VirtualClock(10.)
+        decoder = tests.decoder([tests.track()])
+        transport = self.transport = Transport(self.clock)
+        transport.run = decoder.run
+        transport.tracker = Tracker(midi.Processor())
+        transport.paused = None
+        transport.players = [Recorder(transport), Recorder(transport)]
+        for player in transport.players:
+            player.header(decoder.header)
+            player.goal = 11.
+
+    def test_speed_applies_to_all_players(self):
+        self.transport.do_speed(200)
+        for player in self.transport.players:
+            self.assertEqual(player.goal, 12.)
+            self.assertEqual(player.time_rate, 1e-6 * 500000 * 2 / 96)
+
+    def test_resume_applies_to_all_players(self):
+        transport = self.transport
+        transport.do_pause()
+        self.clock.burn(5.)
+        transport.do_resume()
+        for player in transport.players:
+            self.assertEqual(player.goal, 16.)
+
+if __name__ == '__main__':
+    unittest.main()